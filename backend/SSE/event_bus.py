@@ -28,3 +28,8 @@ def publish(project_id: int, data: Dict[str, Any]) -> None:
             q.put_nowait(data)
         except Exception:
             pass
+
+def publish_all(data: Dict[str, Any]) -> None:
+    """Projektübergreifende Events (z. B. Artikel-Doku), an alle verbundenen Clients."""
+    for project_id in list(_clients.keys()):
+        publish(project_id, {**data, "project_id": project_id})
@@ -0,0 +1,162 @@
+# backend/articles/article_match_engine.py
+"""
+Draft-to-article matching for /compare_article_draft.
+- The viz tables (materialized_article_viz_5/6) are only rebuilt when articles changed:
+  writers (import, doc counters) bump the "articles" generation in their transaction, a rebuild
+  bumps the viz generations -> stale iff articles > viz (works across workers, no lock to invalidate).
+- Per viz table a column-major matrix of normalized strings is kept in memory (keyed by the viz
+  generation); a draft is scored with vectorized substring search + argpartition top-k.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+
+from backend.settings.connection_points import engine, DEBUG
+from backend.articles.create_materialized_article_tables import (
+    VIZ_TABLES,
+    materialize_articles_for_visualizer,
+)
+from backend.utils.materialized import ARTICLES_GENERATION, ensure_generations_table
+
+DEFAULT_TOP_K = 100
+
+# nur Aufbau (Viz-Tabellen, Indexe); Lesen/Invalidieren braucht ihn nicht
+_build_lock = threading.Lock()
+_indexes: Dict[int, "ArticleMatchIndex"] = {}
+
+_GENERATIONS_SQL = text("""
+    SELECT table_name, generation FROM materialized_generations
+    WHERE table_name = ANY(:names)
+""")
+
+
+def _normalize(value) -> str:
+    return "" if value is None else str(value).strip().lower()
+
+
+class ArticleMatchIndex:
+    """
+    Column-major matrix of normalized cell strings. Per column only the distinct
+    values are searched (np.char.find) and mapped back to rows via the inverse index.
+    """
+
+    def __init__(self, columns: List[str], rows: List[Dict[str, Any]], generation: Optional[int] = None):
+        self.generation = generation
+        self.columns = columns
+        self.rows = rows
+        self._values: Dict[str, np.ndarray] = {}
+        self._inverse: Dict[str, np.ndarray] = {}
+        for col in columns:
+            cells = np.array([_normalize(row.get(col)) for row in rows], dtype=str)
+            values, inverse = np.unique(cells, return_inverse=True)
+            self._values[col] = values
+            self._inverse[col] = inverse.reshape(-1)
+
+    def _column_hits(self, col: str, query: str) -> np.ndarray:
+        """bool[n_rows]: non-empty cell contains query as substring."""
+        values = self._values[col]
+        value_hits = (np.char.find(values, query) >= 0) & (values != "")
+        return value_hits[self._inverse[col]]
+
+    def match(self, draft: Dict[str, Any], top_k: Optional[int] = DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        query = {}
+        for col in self.columns:
+            q = _normalize(draft.get(col))
+            if q != "":
+                query[col] = q
+        n_rows = len(self.rows)
+        if not query or n_rows == 0:
+            return []
+
+        hits = {col: self._column_hits(col, q) for col, q in query.items()}
+        matches = np.zeros(n_rows, dtype=np.int32)
+        for col_hits in hits.values():
+            matches += col_hits
+
+        # Ranking wie bisher: (mismatches, -matches), bei Gleichstand Tabellenreihenfolge
+        candidates = np.flatnonzero(matches > 0)
+        if candidates.size == 0:
+            return []
+        keys = (len(query) - matches[candidates]).astype(np.int64) * n_rows + candidates
+        if top_k is not None and top_k <= 0:
+            return []
+        if top_k is not None and top_k < candidates.size:
+            part = np.argpartition(keys, top_k - 1)[:top_k]
+            candidates, keys = candidates[part], keys[part]
+        ranked = candidates[np.argsort(keys, kind="stable")]
+
+        results = []
+        for row_idx in ranked.tolist():
+            cell_matches = {col: ("match" if hits[col][row_idx] else "mismatch") for col in query}
+            m = int(matches[row_idx])
+            results.append({
+                "row": self.rows[row_idx],
+                "cell_matches": cell_matches,
+                "matches": m,
+                "mismatches": len(query) - m,
+                "perfect_match": m == len(query),
+            })
+        return results
+
+
+def _generations() -> Dict[str, int]:
+    ensure_generations_table()
+    with engine.connect() as conn:
+        rows = conn.execute(_GENERATIONS_SQL, {"names": [ARTICLES_GENERATION, *VIZ_TABLES.values()]})
+        return {name: generation for name, generation in rows}
+
+
+def _viz_stale(generations: Dict[str, int]) -> bool:
+    viz = [generations.get(t) for t in VIZ_TABLES.values()]
+    if any(g is None for g in viz):
+        return True  # noch nie (mit Generation) gebaut
+    return generations.get(ARTICLES_GENERATION, 0) > min(viz)
+
+
+def ensure_article_viz_tables() -> Dict[str, int]:
+    """Viz-Tabellen neu bauen, falls articles seit dem letzten Build geändert wurde; Rückgabe = Generationen."""
+    generations = _generations()
+    if not _viz_stale(generations):
+        return generations
+    with _build_lock, engine.connect() as conn:
+        # Worker-übergreifend nur ein Rebuild; danach erneut prüfen (evtl. hat ein anderer schon gebaut)
+        conn.execute(text("SELECT pg_advisory_lock(hashtext('article_viz_rebuild'))"))
+        try:
+            generations = _generations()
+            if _viz_stale(generations):
+                if DEBUG:
+                    print("[DEBUG] articles changed -> rebuilding article viz tables")
+                materialize_articles_for_visualizer(1)
+                generations = _generations()
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(hashtext('article_viz_rebuild'))"))
+            conn.commit()
+    return generations
+
+
+def get_match_index(base_view_id: int) -> ArticleMatchIndex:
+    table_name = VIZ_TABLES.get(base_view_id, f"materialized_article_viz_{base_view_id}")
+    generation = ensure_article_viz_tables().get(table_name)
+    index = _indexes.get(base_view_id)
+    if index is not None and index.generation == generation:
+        return index
+    with _build_lock:
+        index = _indexes.get(base_view_id)
+        if index is not None and index.generation == generation:
+            return index
+        with engine.connect() as conn:
+            result = conn.execute(text(f'SELECT * FROM "{table_name}"'))
+            all_columns = list(result.keys())
+            # interne Spalten (__viz_pos, ...) gehören nicht in die Antwort
+            visible = [i for i, c in enumerate(all_columns) if not c.startswith("__")]
+            columns = [all_columns[i] for i in visible]
+            rows = [{columns[j]: row[i] for j, i in enumerate(visible)} for row in result.fetchall()]
+        if base_view_id == 5:
+            rows = [row for row in rows if row.get("article_typ") == "Motor"]
+        elif base_view_id == 6:
+            rows = [row for row in rows if row.get("article_typ") != "Motor" or row.get("article_typ") is None]
+        index = _indexes[base_view_id] = ArticleMatchIndex(columns, rows, generation)
+        return index
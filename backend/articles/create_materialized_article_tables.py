@@ -6,6 +6,8 @@ Materializes two article tables for visualization, including revisions as rows b
 - Sources: articles (main), article_revisions (deltas).
 - No header_rows logic.
 - Each article row is followed by its revisions, which inherit and override data from the previous version.
+- Revision inheritance is computed in SQL (window functions, carry-forward); each table is one
+  CREATE TABLE AS into a shadow table, swapped in at the end.
 """
 
 import sys
@@ -14,7 +16,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../.
 
 import psycopg2
 from backend.settings.connection_points import DB_URL, DEBUG
-from backend.utils.doc_meta_counter import count_doc_meta_for_article, batch_update_doc_meta_for_articles
+from backend.utils.doc_meta_counter import batch_update_doc_meta_for_articles
+from backend.utils.doc_meta_watcher import doc_meta_watcher
+from backend.utils.materialized import bump_generation
 import json
 
 with open(os.path.join(os.path.dirname(__file__), '../../config.json'), 'r', encoding='utf-8') as f:
@@ -32,94 +36,135 @@ def get_article_columns(cursor, base_view_id):
     """, (base_view_id,))
     return [(row[0], row[1] or row[0]) for row in cursor.fetchall()]
 
-def create_materialized_article_table(project_id: int, base_view_id: int, table_name: str):
+VIZ_TABLES = {
+    5: "materialized_article_viz_5",
+    6: "materialized_article_viz_6",
+}
+
+# Stable row ordinal (keyset pagination); internal, not shown as a column
+VIZ_POS_COLUMN = "__viz_pos"
+VIZ_POS_COLUMN_SQL = f'ROW_NUMBER() OVER (ORDER BY __aid, __seq) AS "{VIZ_POS_COLUMN}"'
+
+
+def _base_view_filter_sql(base_view_id: int, alias: str) -> str:
+    """Filter by article_typ based on base_view_id (5 = Motor, 6 = everything else)."""
+    if base_view_id == 5:
+        return f"{alias}.article_typ = 'Motor'"
+    if base_view_id == 6:
+        return f"({alias}.article_typ != 'Motor' OR {alias}.article_typ IS NULL)"
+    return "TRUE"
+
+
+def _source_columns(cursor) -> dict[str, set]:
+    cursor.execute("""
+        SELECT table_name, column_name
+        FROM information_schema.columns
+        WHERE table_name IN ('articles', 'article_revisions')
+    """)
+    cols = {"articles": set(), "article_revisions": set()}
+    for table, col in cursor.fetchall():
+        cols[table].add(col)
+    return cols
+
+
+def _viz_table_sql(base_view_id: int, columns, source_cols, target: str) -> str:
+    """
+    CREATE TABLE AS for one viz table. Revisions inherit the previous version:
+    per column, COUNT(non-null) OVER (article ORDER BY version) opens a new group
+    at every non-null value, MAX over that group carries it forward.
+    """
+    a_cols = source_cols["articles"]
+    r_cols = source_cols["article_revisions"]
+
+    src_a, src_r, grp_parts, out_parts = [], [], [], []
+    for i, (internal, external) in enumerate(columns):
+        if internal == 'article_id':
+            # Always set article_id to the original article's id
+            out_parts.append(f'__aid::text AS "{external}"')
+            continue
+        if internal == 'article_revision_char':
+            # No revision for base article; revisions show their own rev_char (not inherited)
+            out_parts.append(f'__rev_char AS "{external}"')
+            continue
+        src_a.append(f'(a."{internal}")::text AS c{i}' if internal in a_cols else f'NULL::text AS c{i}')
+        src_r.append(f'(r."{internal}")::text AS c{i}' if internal in r_cols else f'NULL::text AS c{i}')
+        grp_parts.append(f'COUNT(c{i}) OVER w AS g{i}')
+        out_parts.append(f'MAX(c{i}) OVER (PARTITION BY __aid, g{i}) AS "{external}"')
+
+    rev_char = 'r.rev_char::text' if 'rev_char' in r_cols else 'NULL::text'
+    rev_order = 'r.rev_char, r.id' if 'rev_char' in r_cols else 'r.id'
+    lead_a = ", ".join(src_a)
+    lead_r = ", ".join(src_r)
+    return f'''
+        CREATE TABLE "{target}" AS
+        WITH src AS (
+            SELECT a.id AS __aid, 0::bigint AS __seq, NULL::text AS __rev_char{", " + lead_a if lead_a else ""}
+            FROM articles a
+            WHERE {_base_view_filter_sql(base_view_id, "a")}
+            UNION ALL
+            SELECT r.article_id, ROW_NUMBER() OVER (PARTITION BY r.article_id ORDER BY {rev_order}), {rev_char}{", " + lead_r if lead_r else ""}
+            FROM article_revisions r
+            JOIN articles a ON a.id = r.article_id AND {_base_view_filter_sql(base_view_id, "a")}
+            WHERE {_base_view_filter_sql(base_view_id, "r")}
+        ),
+        grp AS (
+            SELECT src.*{", " + ", ".join(grp_parts) if grp_parts else ""}
+            FROM src
+            WINDOW w AS (PARTITION BY __aid ORDER BY __seq)
+        )
+        SELECT {", ".join(out_parts + [VIZ_POS_COLUMN_SQL])}
+        FROM grp
+        ORDER BY __aid, __seq
+    '''
+
+
+def create_materialized_article_tables(project_id: int, targets: dict[int, str]):
+    """
+    Builds all target tables {base_view_id: table_name} set-based in Postgres
+    (one CREATE TABLE AS each, into a shadow table), then swaps them in within
+    a single transaction. No article rows are loaded into Python.
+    """
     conn = psycopg2.connect(DB_URL)
     cursor = conn.cursor()
-    columns = get_article_columns(cursor, base_view_id)  # List of (internal, external)
-    internal_names = [col[0] for col in columns]
-    external_names = [col[1] for col in columns]
-    col_exprs = ', '.join([f'"{col}"' for col in external_names])
-
-    # 1. Get all articles (no project_id filter)
-    cursor.execute("SELECT * FROM articles LIMIT 0;")
-    if cursor.description:
-        article_cols = [desc[0] for desc in cursor.description]
-    else:
-        article_cols = []
-    # Filter articles by article_typ based on base_view_id
-    if base_view_id == 5:
-        cursor.execute("SELECT * FROM articles WHERE article_typ = 'Motor' ORDER BY id ASC")
-    elif base_view_id == 6:
-        cursor.execute("SELECT * FROM articles WHERE article_typ != 'Motor' OR article_typ IS NULL ORDER BY id ASC")
-    else:
-        cursor.execute("SELECT * FROM articles ORDER BY id ASC")
-    articles = cursor.fetchall()
-    if articles and article_cols:
-        article_map = {a[article_cols.index('id')]: dict(zip(article_cols, a)) for a in articles}
-    else:
-        article_map = {}
-
-    # 2. Get all revisions, sorted by article_id, then rev_char (no project_id filter)
-    cursor.execute("SELECT * FROM article_revisions LIMIT 0;")
-    if cursor.description:
-        rev_cols = [desc[0] for desc in cursor.description]
-    else:
-        rev_cols = []
-    # Filter revisions by article_typ based on base_view_id
-    if base_view_id == 5:
-        cursor.execute("SELECT * FROM article_revisions WHERE article_typ = 'Motor' ORDER BY article_id ASC, rev_char ASC")
-    elif base_view_id == 6:
-        cursor.execute("SELECT * FROM article_revisions WHERE article_typ != 'Motor' OR article_typ IS NULL ORDER BY article_id ASC, rev_char ASC")
-    else:
-        cursor.execute("SELECT * FROM article_revisions ORDER BY article_id ASC, rev_char ASC")
-    revisions = cursor.fetchall()
-    if revisions and rev_cols:
-        rev_map = {}
-        for rev in revisions:
-            aid = rev[rev_cols.index('article_id')]
-            rev_map.setdefault(aid, []).append(dict(zip(rev_cols, rev)))
-    else:
-        rev_map = {}
-
-    # Before building rows, update doc meta for all articles in the DB (can be slow)
-    batch_update_doc_meta_for_articles(ARTICLE_DOCUMENTATION_PATH)
-
-    # 3. Build rows: article, then its revisions (each inherits previous)
-    rows = []
-    for aid in sorted(article_map.keys()):
-        base = article_map[aid].copy()
-        # Always set article_id to the original article's id
-        base['article_id'] = aid
-        base['article_revision_char'] = None  # No revision for base article
-        # Now, betr, wart, etc. columns are already updated in the DB by the batch process
-        rows.append([base.get(col) if col != 'article_id' else aid for col in internal_names])
-        prev = base.copy()
-        for rev in rev_map.get(aid, []):
-            new_row = prev.copy()
-            new_row.update({k: v for k, v in rev.items() if k in internal_names and v is not None})
-            new_row['article_id'] = aid  # Always set article_id to the original article's id
-            # Set article_revision_char from rev_char if present
-            new_row['article_revision_char'] = rev.get('rev_char') if 'rev_char' in rev else None
-            rows.append([new_row.get(col) if col != 'article_id' else aid for col in internal_names])
-            prev = new_row
-
-    # 4. Create table and insert rows (use external names)
-    cursor.execute(f'DROP TABLE IF EXISTS "{table_name}";')
-    col_defs = ', '.join([f'"{col}" TEXT' for col in external_names])
-    cursor.execute(f'CREATE TABLE "{table_name}" ({col_defs});')
-    for row in rows:
-        placeholders = ', '.join(['%s'] * len(row))
-        cursor.execute(f'INSERT INTO "{table_name}" VALUES ({placeholders});', row)
-    conn.commit()
-    if DEBUG:
-        print(f"[DEBUG] Created {table_name} with {len(rows)} rows and columns: {external_names}")
-    cursor.close()
-    conn.close()
+
+    # Doc meta is kept live by the watcher; scan (incrementally) ourselves until its initial sync is done
+    if not doc_meta_watcher.is_live():
+        batch_update_doc_meta_for_articles(ARTICLE_DOCUMENTATION_PATH)
+
+    try:
+        source_cols = _source_columns(cursor)
+        for base_view_id, table_name in targets.items():
+            columns = get_article_columns(cursor, base_view_id)  # List of (internal, external)
+            shadow = f"{table_name}__shadow"
+
+            cursor.execute(f'DROP TABLE IF EXISTS "{shadow}";')
+            cursor.execute(_viz_table_sql(base_view_id, columns, source_cols, shadow))
+            row_count = cursor.rowcount
+            cursor.execute(f'CREATE UNIQUE INDEX "{shadow}_pos_idx" ON "{shadow}" ("{VIZ_POS_COLUMN}");')
+
+            cursor.execute(f'DROP TABLE IF EXISTS "{table_name}";')
+            cursor.execute(f'ALTER TABLE "{shadow}" RENAME TO "{table_name}";')
+            cursor.execute(f'ALTER INDEX "{shadow}_pos_idx" RENAME TO "{table_name}_pos_idx";')
+            # Generation > "articles" -> Tabelle gilt als aktuell (article_match_engine)
+            bump_generation(cursor, table_name)
+            if DEBUG:
+                print(f"[DEBUG] Created {table_name} with {row_count} rows and columns: {[c[1] for c in columns]}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def create_materialized_article_table(project_id: int, base_view_id: int, table_name: str):
+    create_materialized_article_tables(project_id, {base_view_id: table_name})
+
 
 def materialize_articles_for_visualizer(project_id: int):
     # Table names can be e.g. materialized_article_viz_5, materialized_article_viz_6
-    create_materialized_article_table(project_id, 5, f"materialized_article_viz_5")
-    create_materialized_article_table(project_id, 6, f"materialized_article_viz_6")
+    create_materialized_article_tables(project_id, VIZ_TABLES)
 
 if __name__ == "__main__":
     # Example usage: rematerialize for project_id=1
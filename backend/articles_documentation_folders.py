@@ -4,12 +4,11 @@ import json
 from copy import deepcopy
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from sqlalchemy import create_engine, text
-from backend.settings.connection_points import DB_URL, ARTICLE_DOCUMENTATION_PATH
+from sqlalchemy import text
+from backend.settings.connection_points import engine, ARTICLE_DOCUMENTATION_PATH
 
 def ensure_article_folders():
     os.makedirs(ARTICLE_DOCUMENTATION_PATH, exist_ok=True)
-    engine = create_engine(DB_URL)
     with engine.connect() as conn:
         result = conn.execute(text("SELECT id FROM articles"))
         article_ids = [row[0] for row in result]
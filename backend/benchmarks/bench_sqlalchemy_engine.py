@@ -0,0 +1,73 @@
+# backend/benchmarks/bench_sqlalchemy_engine.py
+"""
+Vergleich: create_engine() pro Request (alter Stand der Routes) vs. geteilte Engine
+aus connection_points. Misst die Latenz eines typischen kleinen Route-Queries
+(Projektliste) und zählt die dabei geöffneten Backends in pg_stat_activity.
+
+    python -m backend.benchmarks.bench_sqlalchemy_engine --iterations 200
+"""
+
+import argparse
+import statistics
+import time
+
+import sqlalchemy
+
+from backend.settings.connection_points import DB_URL, engine
+
+QUERY = sqlalchemy.text("SELECT id, name FROM projects WHERE deleted_at IS NULL ORDER BY name")
+
+
+def _backend_count(conn) -> int:
+    return conn.execute(sqlalchemy.text(
+        "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()"
+    )).scalar()
+
+
+def _per_request_engine() -> None:
+    eng = sqlalchemy.create_engine(DB_URL)
+    with eng.connect() as conn:
+        conn.execute(QUERY).fetchall()
+    # alte Routes haben nie dispose() aufgerufen; hier schon, sonst läuft der Benchmark in max_connections
+    eng.dispose()
+
+
+def _shared_engine() -> None:
+    with engine.connect() as conn:
+        conn.execute(QUERY).fetchall()
+
+
+def _run(label: str, fn, iterations: int) -> list[float]:
+    fn()  # warm-up (Dialekt-Init / erste Verbindung)
+    timings = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+    print(f"{label:<22} mean {statistics.mean(timings):7.2f} ms | "
+          f"median {statistics.median(timings):7.2f} ms | p95 {p95:7.2f} ms")
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        before = _backend_count(conn)
+    old = _run("create_engine/request", _per_request_engine, args.iterations)
+    new = _run("shared engine", _shared_engine, args.iterations)
+    with engine.connect() as conn:
+        after = _backend_count(conn)
+
+    saved = statistics.mean(old) - statistics.mean(new)
+    print(f"\nsaving per request: {saved:.2f} ms ({saved / statistics.mean(old) * 100:.0f} %)")
+    print(f"backends in pg_stat_activity: before {before}, after {after} "
+          f"(shared engine keeps at most pool_size + max_overflow open)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# backend/benchmarks/bench_tabledata_json.py
+"""
+/api/tabledata (JSON, ganzes Sheet): Python-Pfad vs. DB-seitiges JSON.
+  python: fetch_table_as_hotarray -> Listen (None -> "") -> json.dumps
+  db:     fetch_table_json (json_agg über json_build_array, Bytes ungeparst)
+Gemessen werden Wall-Zeit und Python-CPU-Zeit pro Request (process_time, der
+eigentliche Engpass) sowie die Antwortgröße; am Ende ein Vergleich der geparsten Payloads.
+
+    python -m backend.benchmarks.bench_tabledata_json --table materialized_motoren_1 --project-id 1 --limit 20000
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from backend.db_to_hot_table import fetch_table_as_hotarray, fetch_table_json, fetch_generation
+from backend.settings.connection_points import DB_URL
+from backend.settings.db_pool import init_db_pool, close_db_pool
+
+
+def _json_bytes(content) -> bytes:
+    # wie main._json_bytes
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def _python_path(table: str, limit: int, project_id: int, generation) -> bytes:
+    headers, data = await fetch_table_as_hotarray(DB_URL, table, limit, project_id, generation=generation)
+    return _json_bytes({"headers": headers, "data": data})
+
+
+async def _db_path(table: str, limit: int, project_id: int, generation) -> bytes:
+    return await fetch_table_json(table, limit, project_id, generation=generation)
+
+
+async def _run(label: str, fn, iterations: int, *args) -> bytes:
+    body = await fn(*args)  # warm-up (Metadaten-Cache, Statement-Cache)
+    wall, cpu = [], []
+    for _ in range(iterations):
+        w0, c0 = time.perf_counter(), time.process_time()
+        body = await fn(*args)
+        cpu.append((time.process_time() - c0) * 1000)
+        wall.append((time.perf_counter() - w0) * 1000)
+    print(f"{label:<8} wall mean {statistics.mean(wall):8.2f} ms | median {statistics.median(wall):8.2f} ms | "
+          f"python cpu mean {statistics.mean(cpu):8.2f} ms | {len(body) / 1024:9.1f} KiB")
+    return body
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", required=True)
+    parser.add_argument("--project-id", type=int, required=True)
+    parser.add_argument("--limit", type=int, default=20000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    await init_db_pool()
+    try:
+        generation = await fetch_generation(args.table)
+        py = await _run("python", _python_path, args.iterations, args.table, args.limit, args.project_id, generation)
+        db = await _run("db", _db_path, args.iterations, args.table, args.limit, args.project_id, generation)
+    finally:
+        await close_db_pool()
+
+    py_payload, db_payload = json.loads(py), json.loads(db)
+    print(f"\nrows: {len(py_payload['data'])} | headers equal: {py_payload['headers'] == db_payload['headers']} | "
+          f"data equal: {py_payload['data'] == db_payload['data']} "
+          f"(Abweichungen i. d. R. nur Zahlformat, z. B. numeric 1.50 vs 1.5)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,37 +1,248 @@
+import asyncio
 import asyncpg
-from typing import List, Any, Tuple, Optional
+import json
+from decimal import Decimal, InvalidOperation
+from typing import List, Any, Tuple, Optional, Dict, NamedTuple, AsyncIterator
 from backend.debug_config import DEBUG_FLAGS
+from backend.settings.db_pool import db_connection
+from backend.utils.materialized import (
+    order_tiebreak_sql,
+    row_key_sql,
+    snapshot_select_sql,
+    ensure_generations_table,
+    DELTA_KEEP_GENERATIONS,
+)
+
+def _tiebreak_sql(columns) -> str:
+    # Keyset über (order_key, COALESCE(project_article_id, 0)) – siehe order_key_index_sql
+    return order_tiebreak_sql(columns)
+
+
+# --- Projektion / Filter / Sortierung (/api/tabledata?columns=&filters=&sort=) ---------------
+
+FILTER_OPS = ("eq", "ne", "lt", "le", "gt", "ge", "contains", "startswith", "in", "empty", "notempty")
+_COMPARE_SQL = {"lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+# information_schema.data_type -> Cast für Vergleichswerte; alles andere wird als Text verglichen
+_CAST_TYPES = {
+    "smallint": "smallint", "integer": "int", "bigint": "bigint", "numeric": "numeric",
+    "real": "real", "double precision": "float8", "boolean": "bool", "date": "date",
+    "timestamp without time zone": "timestamp", "timestamp with time zone": "timestamptz",
+}
+
+
+def _like_escape(value: Any) -> str:
+    return str(value).lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _json_param(raw: Any, name: str) -> list:
+    if raw is None or raw == "":
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            raise ValueError(f"{name}: invalid JSON")
+    if isinstance(raw, dict):
+        raw = [raw]
+    if not isinstance(raw, list):
+        raise ValueError(f"{name}: expected a list")
+    return raw
+
+
+class TableQuery(NamedTuple):
+    """
+    Spaltenauswahl, Filter und Sortierung für eine materialisierte Tabelle.
+    Hashbar -> Teil des Cache-/Single-Flight-Keys in main.py.
+    Spaltennamen werden erst in compile() gegen die echten Tabellenspalten geprüft,
+    Werte gehen ausschließlich als Parameter in die Query.
+    """
+    columns: Optional[Tuple[str, ...]] = None
+    filters: Tuple[Tuple[str, str, Any], ...] = ()
+    sort: Tuple[Tuple[str, str], ...] = ()
+
+    @classmethod
+    def parse(cls, columns: Any = None, filters: Any = None, sort: Any = None) -> "TableQuery":
+        """
+        columns: "A,B" oder Liste
+        filters: JSON [{"col": "EMSR-Nr", "op": "startswith", "value": "10"}, ...] (UND-verknüpft)
+        sort:    JSON [{"col": "Einbauort", "dir": "desc"}, ...]
+        ValueError bei ungültiger Form.
+        """
+        if isinstance(columns, str):
+            columns = [c.strip() for c in columns.split(",") if c.strip()]
+        cols = tuple(dict.fromkeys(columns)) if columns else None
+
+        parsed_filters = []
+        for f in _json_param(filters, "filters"):
+            if not isinstance(f, dict) or not isinstance(f.get("col"), str):
+                raise ValueError("filters: each entry needs a 'col'")
+            op = str(f.get("op", "eq")).lower()
+            if op not in FILTER_OPS:
+                raise ValueError(f"filters: unknown op {op!r}")
+            value = f.get("value")
+            if op == "in":
+                if not isinstance(value, list) or not value:
+                    raise ValueError("filters: 'in' needs a non-empty list")
+                value = tuple(None if v is None else str(v) for v in value)
+            elif op in ("empty", "notempty"):
+                value = None
+            elif value is None or isinstance(value, (list, dict)):
+                raise ValueError(f"filters: op {op!r} needs a scalar value")
+            else:
+                value = str(value)
+            parsed_filters.append((f["col"], op, value))
+
+        parsed_sort = []
+        for s in _json_param(sort, "sort"):
+            if isinstance(s, str):
+                s = {"col": s}
+            if not isinstance(s, dict) or not isinstance(s.get("col"), str):
+                raise ValueError("sort: each entry needs a 'col'")
+            direction = str(s.get("dir", "asc")).lower()
+            if direction not in ("asc", "desc"):
+                raise ValueError(f"sort: invalid dir {direction!r}")
+            parsed_sort.append((s["col"], direction))
+
+        return cls(cols, tuple(parsed_filters), tuple(parsed_sort))
+
+    def is_default(self) -> bool:
+        return self.columns is None and not self.filters and not self.sort
+
+    def compile(self, column_types: Dict[str, str], params: List[Any]) -> Tuple[List[str], List[str], List[str]]:
+        """
+        -> (headers, where-Teile, order-Teile). Hängt Filterwerte an params an.
+        column_types: {column_name: information_schema.data_type} der Tabelle.
+        """
+        def ident(col: str) -> str:
+            if col not in column_types:
+                raise ValueError(f"unknown column: {col!r}")
+            return _quote_ident(col)
+
+        if self.columns is None:
+            headers = list(column_types)
+        else:
+            headers = self.columns
+            for col in headers:
+                ident(col)
+
+        where = []
+        for col, op, value in self.filters:
+            q = ident(col)
+            cast = _CAST_TYPES.get(column_types[col])
+            lowered = f"lower({q}::text)"
+            if op == "empty":
+                where.append(f"({q} IS NULL OR {q}::text = '')")
+                continue
+            if op == "notempty":
+                where.append(f"({q} IS NOT NULL AND {q}::text <> '')")
+                continue
+            if op == "in":
+                params.append([v if cast else (v or "").lower() for v in value])
+                if cast:
+                    where.append(f"{q} = ANY(${len(params)}::text[]::{cast}[])")
+                else:
+                    where.append(f"{lowered} = ANY(${len(params)}::text[])")
+                continue
+            if op in ("contains", "startswith"):
+                pattern = _like_escape(value) + "%"
+                params.append("%" + pattern if op == "contains" else pattern)
+                where.append(f"{lowered} LIKE ${len(params)}")
+                continue
+            params.append(value if cast else value.lower())
+            if cast:
+                rhs = f"${len(params)}::text::{cast}"
+                lhs = q
+            else:
+                rhs = f"${len(params)}::text"
+                lhs = lowered
+            if op == "eq":
+                where.append(f"{lhs} = {rhs}")
+            elif op == "ne":
+                where.append(f"{lhs} IS DISTINCT FROM {rhs}")
+            else:
+                where.append(f"{lhs} {_COMPARE_SQL[op]} {rhs}")
+
+        order = [f"{ident(col)} {direction.upper()} NULLS LAST" for col, direction in self.sort]
+        return list(headers), where, order
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _select_sql(headers: List[str]) -> str:
+    return ", ".join(_quote_ident(h) for h in headers)
+
+
+# Spalten + Typen pro materialisierter Tabelle, gültig für genau eine Generation.
+# Spalten ändern sich nur bei einem Rebuild, und der erhöht die Generation (Sequenz, nie wiederverwendet)
+# -> ein tabledata-Read braucht information_schema nur einmal pro Rebuild.
+_metadata_cache: Dict[str, Tuple[int, Dict[str, str]]] = {}
+
+
+async def _column_types(conn, table_name: str, generation: Optional[int] = None) -> Dict[str, str]:
+    """{column_name: data_type}; generation=None (Tabelle ohne Generation) -> immer frisch lesen."""
+    if generation is not None:
+        cached = _metadata_cache.get(table_name)
+        if cached is not None and cached[0] == generation:
+            return cached[1]
+    rows = await conn.fetch("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = $1
+        ORDER BY ordinal_position
+    """, table_name)
+    column_types = {r["column_name"]: r["data_type"] for r in rows}
+    if generation is not None and column_types:
+        _metadata_cache[table_name] = (generation, column_types)
+    return column_types
+
 
 async def fetch_table_as_hotarray(
     db_url: str,
     table_name: str,
     limit: int = 1000,
-    project_id: Optional[int] = None
-) -> Tuple[List[str], List[List[Any]]]:
-    conn = await asyncpg.connect(dsn=db_url)
+    project_id: Optional[int] = None,
+    as_records: bool = False,
+    query: Optional[TableQuery] = None,
+    generation: Optional[int] = None,
+) -> Tuple[List[str], List[Any]]:
+    """
+    as_records=True: Records unverändert (NULL bleibt None) für kompakte Encoder.
+    query: Spaltenauswahl / Filter / Sortierung (ValueError bei unbekannter Spalte).
+    generation: aktuelle Generation der Tabelle -> Spalten-Metadaten aus dem Cache.
+    """
+    query = query or TableQuery()
     try:
-        # Check if the table has a project_id column
-        col_query = f"SELECT column_name FROM information_schema.columns WHERE table_name = $1"
-        col_rows = await conn.fetch(col_query, table_name)
-        columns = [r["column_name"] for r in col_rows]
-        has_project_id = "project_id" in columns
-
-        # Fetch data directly from the materialized table
-        if project_id is not None and has_project_id:
-            query = f'SELECT * FROM "{table_name}" WHERE project_id = $1 LIMIT {limit}'
-            rows = await conn.fetch(query, project_id)
-        else:
-            query = f'SELECT * FROM "{table_name}" LIMIT {limit}'
-            rows = await conn.fetch(query)
+        async with db_connection(db_url) as conn:
+            column_types = await _column_types(conn, table_name, generation)
+            columns = list(column_types)
+            params: List[Any] = []
+            headers, where, order = query.compile(column_types, params)
+            # Check if the table has a project_id column
+            if project_id is not None and "project_id" in columns:
+                params.append(project_id)
+                where.append(f"project_id = ${len(params)}")
+            where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+
+            # Fetch data directly from the materialized table (Sheet-Reihenfolge, falls vorhanden)
+            if "order_key" in columns:
+                order += ['"order_key"', _tiebreak_sql(columns)]
+            order_sql = f" ORDER BY {', '.join(order)}" if order else ""
+            select_sql = "*" if query.columns is None else _select_sql(headers)
+            rows = await conn.fetch(
+                f'SELECT {select_sql} FROM "{table_name}"{where_sql}{order_sql} LIMIT {int(limit)}', *params
+            )
+    except (ValueError, asyncpg.DataError):
+        raise
     except Exception as e:
-        await conn.close()
         # Return error info in a special way (empty headers, data, and error message)
         return [], [[f"DB-Error: {str(e)}"]]
-    await conn.close()
 
     if not rows:
         return [], []
     headers = list(rows[0].keys())
+    if as_records:
+        return headers, rows
     data = [[row[header] if row[header] is not None else "" for header in headers] for row in rows]
 
     if DEBUG_FLAGS.get("db_to"):
@@ -39,3 +250,353 @@ async def fetch_table_as_hotarray(
         print("🧮 Full Data:", data)
 
     return headers, data
+
+
+# json_build_array nimmt max. 100 Argumente (FUNC_MAX_ARGS) -> breite Sheets in Stücken als jsonb verketten
+_JSON_ARRAY_MAX_ARGS = 100
+
+
+def _json_row_sql(headers: List[str], alias: str) -> str:
+    cells = [f"COALESCE(to_json({alias}.{_quote_ident(h)}), '\"\"'::json)" for h in headers]
+    if len(cells) <= _JSON_ARRAY_MAX_ARGS:
+        return f"json_build_array({', '.join(cells)})"
+    chunks = [cells[i:i + _JSON_ARRAY_MAX_ARGS] for i in range(0, len(cells), _JSON_ARRAY_MAX_ARGS)]
+    return "(" + " || ".join(f"jsonb_build_array({', '.join(c)})" for c in chunks) + ")::json"
+
+
+async def fetch_table_json(
+    table_name: str,
+    limit: int = 1000,
+    project_id: Optional[int] = None,
+    query: Optional[TableQuery] = None,
+    generation: Optional[int] = None,
+) -> bytes:
+    """
+    Wie fetch_table_as_hotarray + json.dumps, aber Postgres baut {"headers", "data"} selbst
+    (json_agg über json_build_array, NULL -> ""). Die Bytes gehen ungeparst an den Client.
+    Zahlen/Datumswerte wie to_json sie schreibt; leere Tabelle -> headers [] wie im Python-Pfad.
+    """
+    query = query or TableQuery()
+    async with db_connection() as conn:
+        column_types = await _column_types(conn, table_name, generation)
+        if not column_types:
+            raise LookupError(f'relation "{table_name}" does not exist')
+        columns = list(column_types)
+        params: List[Any] = []
+        headers, where, order = query.compile(column_types, params)
+        if project_id is not None and "project_id" in columns:
+            params.append(project_id)
+            where.append(f"project_id = ${len(params)}")
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        if "order_key" in columns:
+            order += ['"order_key"', _tiebreak_sql(columns)]
+        order_sql = ", ".join(order)
+        # __rn hält die Reihenfolge für json_agg fest (Reihenfolge der Subquery ist nicht garantiert)
+        rn_sql = f"row_number() OVER (ORDER BY {order_sql})" if order else "row_number() OVER ()"
+        params.append(json.dumps(headers, ensure_ascii=False))
+        body = await conn.fetchval(f"""
+            SELECT json_build_object(
+                'headers', CASE WHEN count(*) = 0 THEN '[]'::json ELSE ${len(params)}::text::json END,
+                'data', COALESCE(json_agg({_json_row_sql(headers, "t")} ORDER BY t."__rn"), '[]'::json)
+            )::text
+            FROM (
+                SELECT {_select_sql(headers)}, {rn_sql} AS "__rn"
+                FROM "{table_name}"{where_sql}
+                {f"ORDER BY {order_sql}" if order else ""}
+                LIMIT {int(limit)}
+            ) t
+        """, *params)
+    return body.encode("utf-8")
+
+
+async def prepare_table_stream(
+    table_name: str,
+    limit: int,
+    project_id: Optional[int] = None,
+    offset: Optional[int] = None,
+    query: Optional[TableQuery] = None,
+    generation: Optional[int] = None,
+) -> Tuple[List[str], str, List[Any]]:
+    """
+    Prüft Tabelle + query vor dem ersten gesendeten Byte (Fehler noch als 400/404 möglich).
+    -> (headers, sql, params) für iter_table_chunks. LookupError / ValueError wie fetch_table_window.
+    """
+    query = query or TableQuery()
+    async with db_connection() as conn:
+        column_types = await _column_types(conn, table_name, generation)
+    if not column_types:
+        raise LookupError(f'relation "{table_name}" does not exist')
+    columns = list(column_types)
+    params: List[Any] = []
+    headers, where, order = query.compile(column_types, params)
+    if project_id is not None and "project_id" in columns:
+        params.append(project_id)
+        where.append(f"project_id = ${len(params)}")
+    where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+    if "order_key" in columns:
+        order += ['"order_key"', _tiebreak_sql(columns)]
+    order_sql = f" ORDER BY {', '.join(order)}" if order else ""
+    offset_sql = f" OFFSET {int(offset)}" if offset else ""
+    sql = f'SELECT {_select_sql(headers)} FROM "{table_name}"{where_sql}{order_sql} LIMIT {int(limit)}{offset_sql}'
+    return headers, sql, params
+
+
+async def iter_table_chunks(sql: str, params: List[Any], chunk_size: int = 1000) -> AsyncIterator[List[List[Any]]]:
+    """
+    Server-seitiger Cursor: je Fetch höchstens chunk_size Zeilen im Speicher (NULL -> "").
+    Hält eine Pool-Verbindung (+ Transaktion) bis der Stream fertig oder abgebrochen ist.
+    """
+    async with db_connection() as conn:
+        async with conn.transaction(readonly=True):
+            cursor = await conn.cursor(sql, *params)
+            while True:
+                records = await cursor.fetch(chunk_size)
+                if not records:
+                    return
+                yield [["" if v is None else v for v in record.values()] for record in records]
+
+
+def encode_cursor(order_key: Any, tiebreak: Any) -> str:
+    return f"{order_key}:{tiebreak or 0}"
+
+
+def decode_cursor(cursor: str) -> Tuple[Decimal, int]:
+    try:
+        key, tiebreak = cursor.rsplit(":", 1)
+        return Decimal(key), int(tiebreak)
+    except (ValueError, InvalidOperation):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+
+
+async def fetch_table_window(
+    table_name: str,
+    limit: int = 500,
+    project_id: Optional[int] = None,
+    offset: Optional[int] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    as_records: bool = False,
+    query: Optional[TableQuery] = None,
+    generation: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Ein Zeilenfenster einer materialisierten Tabelle in Sheet-Reihenfolge.
+    - after=<cursor>:  die nächsten `limit` Zeilen (Scrollen nach unten)
+    - before=<cursor>: die `limit` Zeilen davor (Scrollen nach oben)
+    - offset=n:        Sprung an Zeilenindex n (z. B. Scrollbar gezogen)
+    Cursor = "<order_key>:<project_article_id|0>" – stabil, auch wenn Zeilen davor hinzukommen.
+    Liefert headers, data, total, first_cursor/last_cursor und has_prev/has_next.
+    ValueError bei ungültigem Cursor / Tabelle ohne order_key.
+    as_records=True: data enthält die Records unverändert (Spalten in headers-Reihenfolge).
+    query: Spaltenauswahl / Filter (total zählt gefiltert) / Sortierung. Mit eigener Sortierung
+    passen die order_key-Cursor nicht mehr -> nur offset-Paging (ValueError bei after/before).
+    generation: wie bei fetch_table_as_hotarray.
+    """
+    query = query or TableQuery()
+    if query.sort and (after is not None or before is not None):
+        raise ValueError("after/before cannot be combined with sort, use offset")
+    async with db_connection() as conn:
+        column_types = await _column_types(conn, table_name, generation)
+        columns = list(column_types)
+        if not columns:
+            raise LookupError(f'relation "{table_name}" does not exist')
+        if "order_key" not in columns:
+            raise ValueError(f"{table_name} has no order_key column")
+
+        params: List[Any] = []
+        headers, where, user_order = query.compile(column_types, params)
+        if project_id is not None and "project_id" in columns:
+            params.append(project_id)
+            where.append(f"project_id = ${len(params)}")
+        scope_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        total = await conn.fetchval(f'SELECT COUNT(*) FROM "{table_name}"{scope_sql}', *params)
+
+        tiebreak_sql = _tiebreak_sql(columns)
+        backwards = before is not None
+        if after is not None or backwards:
+            key, tiebreak = decode_cursor(before if backwards else after)
+            params += [key, tiebreak]
+            op = "<" if backwards else ">"
+            where.append(f'("order_key", {tiebreak_sql}) {op} (${len(params) - 1}::numeric, ${len(params)}::int)')
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+        direction = "DESC" if backwards else "ASC"
+        offset_sql = f" OFFSET {int(offset)}" if offset and not (after or backwards) else ""
+        order_sql = ", ".join(user_order + [f'"order_key" {direction}', f"{tiebreak_sql} {direction}"])
+        rows = await conn.fetch(
+            f'SELECT {_select_sql(headers)}, "order_key" AS "__order_key", {tiebreak_sql} AS "__tiebreak" '
+            f'FROM "{table_name}"{where_sql} ORDER BY {order_sql} '
+            f'LIMIT {int(limit) + 1}{offset_sql}',
+            *params,
+        )
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = bool(after) or bool(offset), more
+
+    if as_records:
+        data = rows
+    else:
+        data = [[row[h] if row[h] is not None else "" for h in headers] for row in rows]
+    return {
+        "headers": headers,
+        "data": data,
+        "total": total,
+        "first_cursor": encode_cursor(rows[0]["__order_key"], rows[0]["__tiebreak"]) if rows else None,
+        "last_cursor": encode_cursor(rows[-1]["__order_key"], rows[-1]["__tiebreak"]) if rows else None,
+        "has_prev": has_prev,
+        "has_next": has_next,
+    }
+
+
+async def fetch_generation(table_name: str) -> Optional[int]:
+    """Aktuelle Generation (materialized_generations) oder None, falls (noch) keine existiert."""
+    async with db_connection() as conn:
+        try:
+            return await conn.fetchval(
+                "SELECT generation FROM materialized_generations WHERE table_name = $1", table_name
+            )
+        except asyncpg.UndefinedTableError:
+            return None
+
+
+async def _snapshot_current(conn, table_name: str, keep: int = DELTA_KEEP_GENERATIONS) -> int:
+    """
+    Snapshot der aktuellen Generation nachträglich schreiben (wie utils/materialized.snapshot_row_hashes).
+    ACCESS SHARE auf die Tabelle -> ein Rebuild (DROP/CREATE + Generation in einer Transaktion)
+    ist entweder schon committet und sichtbar oder wartet; Generation und Zeilen passen zusammen.
+    """
+    async with conn.transaction():
+        await conn.execute(f'LOCK TABLE "{table_name}" IN ACCESS SHARE MODE')
+        generation = await conn.fetchval(
+            "SELECT generation FROM materialized_generations WHERE table_name = $1", table_name
+        )
+        columns = await _column_types(conn, table_name, generation)
+        await conn.execute(f"""
+            INSERT INTO materialized_row_hashes
+                (table_name, generation, row_key, project_article_id, order_key, row_hash)
+            SELECT $1, $2, s.* FROM ({snapshot_select_sql(table_name, columns)}) s
+            ON CONFLICT DO NOTHING
+        """, table_name, generation)
+        await conn.execute("""
+            DELETE FROM materialized_row_hashes
+            WHERE table_name = $1
+              AND generation < ALL (
+                  SELECT generation FROM materialized_row_hashes
+                  WHERE table_name = $1
+                  GROUP BY generation
+                  ORDER BY generation DESC
+                  LIMIT $2
+              )
+        """, table_name, keep)
+    return generation
+
+
+class GenerationExpired(Exception):
+    """Snapshot der angefragten Generation nicht mehr vorhanden -> Client lädt komplett neu."""
+
+
+async def fetch_table_delta(table_name: str, since: int, retries: int = 3) -> Dict[str, Any]:
+    """
+    Zeilen-Delta einer materialisierten Tabelle zwischen Generation `since` und der aktuellen
+    (Snapshots in materialized_row_hashes, siehe utils/materialized.snapshot_row_hashes):
+      inserted / updated: {"row_key", "row": [...]} (+ "from_order_key" bei updated)
+      deleted:            {"row_key", "project_article_id", "order_key"} (alte Position)
+      moved:              {"row_key", "project_article_id", "from_order_key", "order_key"}
+    LookupError ohne Generation, GenerationExpired wenn `since` nicht mehr vorgehalten wird.
+    Jeder Aufruf meldet die Tabelle als Delta-Abonnent an (Rebuilds schreiben dann Snapshots);
+    fehlt der Snapshot der aktuellen Generation, wird er hier nachgeholt.
+    """
+    await asyncio.to_thread(ensure_generations_table)
+    async with db_connection() as conn:
+        await conn.execute("""
+            INSERT INTO materialized_delta_subscribers (table_name) VALUES ($1)
+            ON CONFLICT (table_name) DO UPDATE SET requested_at = now()
+        """, table_name)
+        for _ in range(retries):
+            row = await conn.fetchrow("""
+                SELECT g.generation,
+                       EXISTS (SELECT 1 FROM materialized_row_hashes h
+                               WHERE h.table_name = g.table_name AND h.generation = g.generation) AS has_snapshot
+                FROM materialized_generations g WHERE g.table_name = $1
+            """, table_name)
+            if row is None:
+                raise LookupError(f"no generation for {table_name}")
+            current = row["generation"]
+            if not row["has_snapshot"]:
+                # erster Delta-Request (bzw. nach Ablauf des Abos): Basis für die nächsten anlegen
+                current = await _snapshot_current(conn, table_name)
+            if since == current:
+                return {"generation": current, "since": since, "headers": [],
+                        "inserted": [], "updated": [], "deleted": [], "moved": []}
+            has_since = await conn.fetchval("""
+                SELECT EXISTS (SELECT 1 FROM materialized_row_hashes
+                               WHERE table_name = $1 AND generation = $2)
+            """, table_name, since)
+            if not has_since:
+                raise GenerationExpired(f"generation {since} of {table_name} is no longer available")
+
+            changes = await conn.fetch("""
+                WITH old AS (
+                    SELECT row_key, project_article_id, order_key, row_hash
+                    FROM materialized_row_hashes WHERE table_name = $1 AND generation = $2
+                ),
+                cur AS (
+                    SELECT row_key, project_article_id, order_key, row_hash
+                    FROM materialized_row_hashes WHERE table_name = $1 AND generation = $3
+                )
+                SELECT c.row_key, c.project_article_id, o.order_key AS from_order_key, c.order_key,
+                       CASE WHEN o.row_key IS NULL THEN 'inserted'
+                            WHEN o.row_hash <> c.row_hash THEN 'updated'
+                            ELSE 'moved' END AS op
+                FROM cur c
+                LEFT JOIN old o USING (row_key)
+                WHERE o.row_key IS NULL
+                   OR o.row_hash <> c.row_hash
+                   OR o.order_key IS DISTINCT FROM c.order_key
+                UNION ALL
+                SELECT o.row_key, o.project_article_id, o.order_key, NULL, 'deleted'
+                FROM old o
+                WHERE NOT EXISTS (SELECT 1 FROM cur c WHERE c.row_key = o.row_key)
+            """, table_name, since, current)
+
+            changed_keys = [r["row_key"] for r in changes if r["op"] in ("inserted", "updated")]
+            headers, rows_by_key = [], {}
+            if changed_keys:
+                columns = await _column_types(conn, table_name, current)
+                stmt = await conn.prepare(f"""
+                    SELECT * FROM (
+                        SELECT t.*, {row_key_sql("t", columns)} AS "__row_key" FROM "{table_name}" t
+                    ) s
+                    WHERE "__row_key" = ANY($1::text[])
+                """)
+                headers = [a.name for a in stmt.get_attributes() if a.name != "__row_key"]
+                for row in await stmt.fetch(changed_keys):
+                    rows_by_key[row["__row_key"]] = [row[h] if row[h] is not None else "" for h in headers]
+
+            # Tabelle während des Lesens neu gebaut? -> Delta wäre gemischt, nochmal
+            if await conn.fetchval(
+                "SELECT generation FROM materialized_generations WHERE table_name = $1", table_name
+            ) != current:
+                continue
+
+            delta = {"generation": current, "since": since, "headers": headers,
+                     "inserted": [], "updated": [], "deleted": [], "moved": []}
+            for r in changes:
+                op = r["op"]
+                if op == "inserted":
+                    delta[op].append({"row_key": r["row_key"], "row": rows_by_key.get(r["row_key"])})
+                elif op == "updated":
+                    delta[op].append({"row_key": r["row_key"], "from_order_key": r["from_order_key"],
+                                      "row": rows_by_key.get(r["row_key"])})
+                elif op == "deleted":
+                    delta[op].append({"row_key": r["row_key"], "project_article_id": r["project_article_id"],
+                                      "order_key": r["from_order_key"]})
+                else:
+                    delta[op].append({"row_key": r["row_key"], "project_article_id": r["project_article_id"],
+                                      "from_order_key": r["from_order_key"], "order_key": r["order_key"]})
+            return delta
+    raise GenerationExpired(f"{table_name} changed while computing the delta")
@@ -1,71 +1,239 @@
-async def fetch_tree(conn, project_id: int, parent_id=None, sort_nums=None, names=None):
-    if sort_nums is None:
-        sort_nums = []
-    if names is None:
-        names = []
+# Materialisierter Pfad pro Knoten (gepflegt von den stair hierarchy routes):
+#   id_path   = IDs von der Wurzel bis zum Knoten       z. B. {12, 40, 41}
+#   sort_path = sort_order entlang desselben Pfads      z. B. {1, 3, 2}
+#   name_path = Namen entlang desselben Pfads           z. B. {Halle, EG, Raum 2}
+# Teilbaum von X = btree-Range: id_path >= X.id_path AND id_path < next(X.id_path),
+# wobei next() das letzte Element um 1 erhöht ({12, 40} -> {12, 41}).
 
-    rows = await conn.fetch("""
-        SELECT id, name, sort_order
-        FROM stair_element_einbauorte
-        WHERE parent_id IS NOT DISTINCT FROM $1 AND project_id = $2
-        ORDER BY sort_order
-    """, parent_id, project_id)
-
-    result = []
-
-    for r in rows:
-        new_sort = sort_nums + [r["sort_order"]]
-        new_names = names + [r["name"]]
-
-        # Kinder?
-        children = await conn.fetch("""
-            SELECT id FROM stair_element_einbauorte
-            WHERE parent_id = $1 AND project_id = $2
-            LIMIT 1
-        """, r["id"], project_id)
-
-        pos = ".".join(str(x) for x in new_sort)
-        name_path = " | ".join(new_names)
-        # ⬇️ ID zwischen Position und Name
-        if not children:  # Leaf
-            full_name = f"{pos} [{r['id']}] {name_path}"
-            result.append({
-                "id": r["id"],
-                "project_id": project_id,
-                "name": r["name"],
-                "full_name": full_name,
-                "leaf_id": r["id"]
-            })
-        else:
-            # Branch: materialize with warning [!]
-            full_name = f"{pos} [{r['id']}] {name_path} [!]"
-            result.append({
-                "id": r["id"],
-                "project_id": project_id,
-                "name": r["name"],
-                "full_name": full_name,
-                "leaf_id": None
-            })
-            # Also recurse for children
-            result.extend(
-                await fetch_tree(conn, project_id, r["id"], new_sort, new_names)
-            )
-
-    return result
+def _next_path_sql(alias: str) -> str:
+    return (
+        f"{alias}.id_path[1:cardinality({alias}.id_path) - 1]"
+        f" || ({alias}.id_path[cardinality({alias}.id_path)] + 1)"
+    )
+
+
+def _full_name_sql(alias: str) -> str:
+    # gleiches Format wie bisher: "<pos> [<id>] <name | name> [!]" ([!] = Branch)
+    return f"""
+        array_to_string({alias}.sort_path, '.') || ' [' || {alias}.id || '] '
+            || array_to_string({alias}.name_path, ' | ')
+            || CASE WHEN EXISTS (
+                   SELECT 1 FROM stair_element_einbauorte c
+                   WHERE c.parent_id = {alias}.id AND c.project_id = {alias}.project_id
+               ) THEN ' [!]' ELSE '' END
+    """
+
+
+async def rebuild_einbauorte_paths(conn, project_id: int | None = None) -> int:
+    """Berechnet id_path/sort_path/name_path aus parent_id neu (alle Projekte, wenn project_id None)."""
+    result = await conn.execute("""
+        WITH RECURSIVE t AS (
+            SELECT id, project_id, ARRAY[id] AS id_path, ARRAY[sort_order] AS sort_path, ARRAY[name] AS name_path
+            FROM stair_element_einbauorte
+            WHERE parent_id IS NULL
+              AND ($1::int IS NULL OR project_id = $1)
+            UNION ALL
+            SELECT c.id, c.project_id, t.id_path || c.id, t.sort_path || c.sort_order, t.name_path || c.name
+            FROM t
+            JOIN stair_element_einbauorte c ON c.parent_id = t.id AND c.project_id = t.project_id
+        )
+        -- nicht erreichbare Knoten (verwaist) bekommen NULL und fallen aus allen Ranges
+        UPDATE stair_element_einbauorte e
+        SET id_path = t.id_path, sort_path = t.sort_path, name_path = t.name_path
+        FROM stair_element_einbauorte s
+        LEFT JOIN t ON t.id = s.id
+        WHERE e.id = s.id
+          AND ($1::int IS NULL OR s.project_id = $1)
+          AND (e.id_path IS DISTINCT FROM t.id_path
+               OR e.sort_path IS DISTINCT FROM t.sort_path
+               OR e.name_path IS DISTINCT FROM t.name_path)
+    """, project_id)
+    return int(result.split()[-1])
+
+
+async def ensure_einbauorte_paths(conn) -> None:
+    """
+    Pfadspalten + Index idempotent anlegen und alle Pfade befüllen – einmalig beim Start (main.startup).
+    Die Routen halten die Pfade danach nur noch in ihrer eigenen Transaktion aktuell.
+    """
+    async with conn.transaction():
+        # mehrere Worker starten parallel -> DDL + Backfill nur einer zur Zeit
+        await conn.execute("SELECT pg_advisory_xact_lock(hashtext('einbauorte_paths'))")
+        await conn.execute("""
+            ALTER TABLE stair_element_einbauorte
+                ADD COLUMN IF NOT EXISTS id_path int[],
+                ADD COLUMN IF NOT EXISTS sort_path int[],
+                ADD COLUMN IF NOT EXISTS name_path text[];
+            CREATE INDEX IF NOT EXISTS idx_see_project_id_path
+                ON stair_element_einbauorte (project_id, id_path);
+        """)
+        await rebuild_einbauorte_paths(conn)
+
+
+async def repair_einbauorte_paths(conn, project_id: int) -> bool:
+    """
+    Knoten, die nicht über die Routen angelegt wurden (Import, Skripte), haben noch keinen Pfad.
+    Erreichbar, aber ohne Pfad (Wurzel oder Parent mit Pfad) -> Pfade des Projekts neu berechnen.
+    Verwaiste Knoten bleiben bewusst ohne Pfad. Läuft in der Transaktion des Aufrufers.
+    """
+    missing = await conn.fetchval("""
+        SELECT EXISTS (
+            SELECT 1
+            FROM stair_element_einbauorte e
+            LEFT JOIN stair_element_einbauorte p ON p.id = e.parent_id
+            WHERE e.project_id = $1
+              AND e.id_path IS NULL
+              AND (e.parent_id IS NULL OR p.id_path IS NOT NULL)
+        )
+    """, project_id)
+    if missing:
+        await rebuild_einbauorte_paths(conn, project_id)
+    return missing
+
+
+async def set_node_path(conn, id: int) -> None:
+    """Pfad eines (neuen) Knotens aus dem Pfad seines Parents ableiten."""
+    await conn.execute("""
+        UPDATE stair_element_einbauorte e
+        SET id_path   = COALESCE(p.id_path,   '{}'::int[])  || e.id,
+            sort_path = COALESCE(p.sort_path, '{}'::int[])  || e.sort_order,
+            name_path = COALESCE(p.name_path, '{}'::text[]) || e.name
+        FROM (SELECT 1) AS one
+        LEFT JOIN stair_element_einbauorte p ON p.id = (
+            SELECT parent_id FROM stair_element_einbauorte WHERE id = $1
+        )
+        WHERE e.id = $1
+    """, id)
 
 
+async def sync_subtree_paths(conn, project_id: int, root_ids) -> None:
+    """
+    Nach Rename/Move/Reorder: sort_order + name der Wurzelknoten an ihrer Tiefe
+    in sort_path/name_path des ganzen Teilbaums nachziehen (eine Range-Query pro Wurzel).
+    """
+    ids = sorted({int(i) for i in root_ids if i is not None})
+    if not ids:
+        return
+    await conn.execute(f"""
+        UPDATE stair_element_einbauorte t
+        SET sort_path[cardinality(r.id_path)] = r.sort_order,
+            name_path[cardinality(r.id_path)] = r.name
+        FROM stair_element_einbauorte r
+        WHERE r.id = ANY($2::int[])
+          AND r.project_id = $1
+          AND t.project_id = $1
+          AND t.id_path >= r.id_path
+          AND t.id_path < {_next_path_sql("r")}
+    """, project_id, ids)
+
+
+async def fetch_subtree_ids(conn, project_id: int, root_id: int) -> list[int]:
+    """Alle IDs des Teilbaums unter root_id (inkl. root_id)."""
+    rows = await conn.fetch(f"""
+        SELECT t.id
+        FROM stair_element_einbauorte r
+        JOIN stair_element_einbauorte t
+          ON t.project_id = r.project_id
+         AND t.id_path >= r.id_path
+         AND t.id_path < {_next_path_sql("r")}
+        WHERE r.id = $2 AND r.project_id = $1
+    """, project_id, root_id)
+    return [r["id"] for r in rows]
+
+
+async def detach_subtree_paths(conn, project_id: int, root_id: int) -> None:
+    """Vor dem Löschen: Pfade des Teilbaums leeren, damit verwaiste Kinder aus allen Ranges fallen."""
+    await conn.execute(f"""
+        UPDATE stair_element_einbauorte t
+        SET id_path = NULL, sort_path = NULL, name_path = NULL
+        FROM stair_element_einbauorte r
+        WHERE r.id = $2 AND r.project_id = $1
+          AND t.project_id = $1
+          AND t.id_path >= r.id_path
+          AND t.id_path < {_next_path_sql("r")}
+    """, project_id, root_id)
+
 
 async def rematerialize_project_einbauorte(conn, project_id: int) -> int:
+    await rebuild_einbauorte_paths(conn, project_id)
     await conn.execute(
         "DELETE FROM materialized_einbauorte WHERE project_id = $1", project_id
     )
+    result = await conn.execute(f"""
+        INSERT INTO materialized_einbauorte (id, project_id, name, full_name)
+        SELECT t.id, t.project_id, t.name, {_full_name_sql("t")}
+        FROM stair_element_einbauorte t
+        WHERE t.project_id = $1 AND t.id_path IS NOT NULL
+        ORDER BY t.sort_path
+    """, project_id)
+    return int(result.split()[-1])
 
-    all_entries = await fetch_tree(conn, project_id)
 
-    for entry in all_entries:
-        await conn.execute("""
-            INSERT INTO materialized_einbauorte (id, project_id, name, full_name)
-            VALUES ($1, $2, $3, $4)
-        """, entry["id"], entry["project_id"], entry["name"], entry["full_name"])
+# --- Teilbaum-Updates (statt kompletter Rematerialisierung) ---
+
+async def refresh_einbauorte_subtrees(conn, project_id: int, root_ids, include_descendants: bool = True) -> list[int]:
+    """
+    Aktualisiert materialized_einbauorte nur für die Teilbäume unter root_ids
+    (include_descendants=False: nur die Knoten selbst, z. B. Parent nach Insert/Delete).
+    Läuft auf der übergebenen Connection, also in deren Transaktion.
+    Gibt die IDs zurück, deren Zeile sich tatsächlich geändert hat oder neu ist.
+    """
+    ids = sorted({int(i) for i in root_ids if i is not None})
+    if not ids:
+        return []
 
-    return len(all_entries)
+    if include_descendants:
+        match_sql = f"t.id_path >= r.id_path AND t.id_path < {_next_path_sql('r')}"
+    else:
+        match_sql = "t.id = r.id"
+    rows = await conn.fetch(f"""
+        SELECT DISTINCT ON (t.id) t.id, t.name, {_full_name_sql("t")} AS full_name
+        FROM stair_element_einbauorte r
+        JOIN stair_element_einbauorte t
+          ON t.project_id = r.project_id
+         AND t.id_path IS NOT NULL
+         AND {match_sql}
+        WHERE r.id = ANY($2::int[]) AND r.project_id = $1
+        ORDER BY t.id
+    """, project_id, ids)
+    if not rows:
+        return []
+    entry_ids = [r["id"] for r in rows]
+    names = [r["name"] for r in rows]
+    full_names = [r["full_name"] for r in rows]
+
+    updated = await conn.fetch("""
+        UPDATE materialized_einbauorte m
+        SET name = v.name, full_name = v.full_name
+        FROM unnest($2::int[], $3::text[], $4::text[]) AS v(id, name, full_name)
+        WHERE m.project_id = $1
+          AND m.id = v.id
+          AND (m.full_name IS DISTINCT FROM v.full_name OR m.name IS DISTINCT FROM v.name)
+        RETURNING m.id
+    """, project_id, entry_ids, names, full_names)
+
+    inserted = await conn.fetch("""
+        INSERT INTO materialized_einbauorte (id, project_id, name, full_name)
+        SELECT v.id, $1, v.name, v.full_name
+        FROM unnest($2::int[], $3::text[], $4::text[]) AS v(id, name, full_name)
+        WHERE NOT EXISTS (
+            SELECT 1 FROM materialized_einbauorte m
+            WHERE m.project_id = $1 AND m.id = v.id
+        )
+        RETURNING id
+    """, project_id, entry_ids, names, full_names)
+
+    return sorted({r["id"] for r in updated} | {r["id"] for r in inserted})
+
+
+async def remove_einbauorte(conn, project_id: int, ids) -> list[int]:
+    """Löscht materialized_einbauorte-Zeilen (z. B. eines gelöschten Teilbaums)."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return []
+    rows = await conn.fetch("""
+        DELETE FROM materialized_einbauorte
+        WHERE project_id = $1 AND id = ANY($2::int[])
+        RETURNING id
+    """, project_id, ids)
+    return sorted(r["id"] for r in rows)
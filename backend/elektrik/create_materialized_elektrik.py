@@ -7,6 +7,8 @@ import json
 from pathlib import Path
 from backend.settings.connection_points import DB_URL, DEBUG
 from backend.elektrik.get_active_data import get_active_project_articles
+from backend.utils.column_registry import column_registry
+from backend.utils.materialized import order_key_index_sql, filter_index_sqls, bump_generation, snapshot_row_hashes
 
 
 def get_elektrik_article_ids(cursor, project_id):
@@ -85,24 +87,13 @@ def create_materialized_elektrik(project_id: int, debug: bool = False):
             Path("backend/utils/header_name_map.json").read_text(encoding="utf-8")
         )
 
-        # 4. Hole alle verfügbaren Spalten aus den Tabellen
-        cursor.execute("""
-            SELECT table_name, column_name
-            FROM information_schema.columns
-            WHERE table_name IN (
-                'project_articles',
-                'article_drafts',
-                'articles'
-            )
-        """)
-        colmap = {"p": set(), "ad": set(), "a": set()}
-        for table, col in cursor.fetchall():
-            key = {
-                "project_articles": "p",
-                "article_drafts": "ad",
-                "articles": "a"
-            }[table]
-            colmap[key].add(col)
+        # 4. Hole alle verfügbaren Spalten aus den Tabellen (Spalten-Registry, versioniert)
+        columns_snapshot = column_registry.get_sync(cursor)
+        colmap = {
+            "p": set(columns_snapshot.data_types["project_articles"]),
+            "ad": set(columns_snapshot.data_types["article_drafts"]),
+            "a": set(columns_snapshot.data_types["articles"]),
+        }
 
         # 5. Erstelle die COALESCE-Spalten-Ausdrücke nur mit vorhandenen Spalten
         col_exprs = []
@@ -248,6 +239,10 @@ def create_materialized_elektrik(project_id: int, debug: bool = False):
         if DEBUG:
             print("[ELEKTRIK] CREATE SQL:\n", sql)
         cursor.execute(sql, (ids,))
+        cursor.execute(order_key_index_sql(table_name, output_cols))
+        for index_sql in filter_index_sqls(table_name, layout_name_map, output_cols):
+            cursor.execute(index_sql)
+        snapshot_row_hashes(cursor, table_name, bump_generation(cursor, table_name), output_cols)
         conn.commit()  # Ensure commit after table creation
     except Exception as e:
         if debug:
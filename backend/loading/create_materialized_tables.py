@@ -7,6 +7,8 @@ if __name__ == "__main__":
 
 import psycopg2
 from backend.settings.connection_points import DB_URL, get_views_to_show, DEBUG
+from backend.utils.column_registry import column_registry
+from backend.utils.materialized import order_key_index_sql, filter_index_sqls, bump_generation, snapshot_row_hashes
 
 
 def _get_header_rows_flag(cursor, view_id: int) -> bool:
@@ -92,24 +94,13 @@ def create_materialized_table(project_id: int, view_id, base_view_id):
     # No need to load HEADER_MAP anymore, as external names come from columns.name_external_german
     # Remove loading and usage of HEADER_MAP
 
-    # 3. Get all available columns from all layout sources
-    cursor.execute("""
-        SELECT table_name, column_name
-        FROM information_schema.columns
-        WHERE table_name IN (
-            'project_articles',
-            'article_drafts',
-            'articles'
-        )
-    """)
-    colmap = {"p": set(), "ad": set(), "a": set()}
-    for table, col in cursor.fetchall():
-        key = {
-            "project_articles": "p",
-            "article_drafts": "ad",
-            "articles": "a"
-        }[table]
-        colmap[key].add(col)
+    # 3. Get all available columns from all layout sources (Spalten-Registry, versioniert)
+    columns_snapshot = column_registry.get_sync(cursor)
+    colmap = {
+        "p": set(columns_snapshot.data_types["project_articles"]),
+        "ad": set(columns_snapshot.data_types["article_drafts"]),
+        "a": set(columns_snapshot.data_types["articles"]),
+    }
     if DEBUG:
         print(f"[DEBUG] colmap: {colmap}")
 
@@ -154,13 +145,10 @@ def create_materialized_table(project_id: int, view_id, base_view_id):
     if DEBUG:
         print(f"[DEBUG] Column expressions:\n{col_exprs_sql}")
 
-    # Build a map of column types for header row casting, always fresh from information_schema
+    # Build a map of column types for header row casting (Registry, neu geladen nach DDL-Änderungen)
     col_type_map = {}
     for table in ["project_articles", "articles", "article_drafts"]:
-        cursor.execute("""
-            SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s
-        """, (table,))
-        for col, typ in cursor.fetchall():
+        for col, typ in columns_snapshot.data_types[table].items():
             if col not in col_type_map:
                 # Map Postgres types to SQL types for casting
                 if typ.startswith("character") or typ == "text" or typ == "varchar":
@@ -253,7 +241,7 @@ def create_materialized_table(project_id: int, view_id, base_view_id):
             body AS (
                 SELECT
                     {body_row_select_sql},
-                    __pos AS order_key
+                    __pos::numeric AS order_key
                 FROM base_rows b
             ),
             headers_base AS (
@@ -287,7 +275,7 @@ def create_materialized_table(project_id: int, view_id, base_view_id):
             body AS (
                 SELECT
                     {body_row_select_sql},
-                    __pos AS order_key
+                    __pos::numeric AS order_key
                 FROM base_rows b
             )
             SELECT * FROM body
@@ -297,6 +285,10 @@ def create_materialized_table(project_id: int, view_id, base_view_id):
     if DEBUG:
         print(f"[DEBUG] Running CREATE SQL (header_rows={header_on})")
     cursor.execute(sql)
+    cursor.execute(order_key_index_sql(table_name, output_cols))
+    for index_sql in filter_index_sqls(table_name, layout_name_map, output_cols):
+        cursor.execute(index_sql)
+    snapshot_row_hashes(cursor, table_name, bump_generation(cursor, table_name), output_cols)
     conn.commit()
     print(f"✅ Created: {table_name}")
     cursor.close()
@@ -1,21 +1,49 @@
 from fastapi import FastAPI, Query, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+import asyncio
+import hashlib
 import logging
+import json
 import asyncpg
-from typing import Optional
+from typing import Optional, Tuple
 
-from backend.db_to_hot_table import fetch_table_as_hotarray
+from backend.db_to_hot_table import (
+    fetch_table_as_hotarray,
+    fetch_table_window,
+    fetch_table_json,
+    prepare_table_stream,
+    iter_table_chunks,
+    fetch_generation,
+    fetch_table_delta,
+    GenerationExpired,
+    TableQuery,
+)
+from backend.utils.table_encoding import wants_msgpack, encode_columnar_msgpack, MSGPACK_MEDIA_TYPE
+from backend.utils.tabledata_cache import tabledata_cache, tabledata_flight, generation_listener, CachedPayload
 from backend.api import router as api_router
+from backend.utils.doc_meta_watcher import doc_meta_watcher
+from backend.utils.edit_buffer import edit_buffer
+from backend.settings.db_pool import init_db_pool, close_db_pool, db_connection
+from backend.einbauorte.create_materialized_einbauorte import ensure_einbauorte_paths
+from backend.utils.materialized import assert_belongs
+from backend.utils.edit_writer import ensure_drafts_unique_index
 from backend.settings.connection_points import (
     DB_URL,
     get_views_to_show,
     DEBUG,
     FRONTEND_ORIGINS,
     FRONTEND_ORIGIN_REGEX,
+    DB_POOL_MAX_SIZE,
+    TABLEDATA_JSON_MODE,
+    TABLEDATA_STREAM_CHUNK_ROWS,
 )
 
+# parallele Sheet-Reads pro /api/tabledata/batch (Rest des Pools bleibt für andere Requests)
+TABLEDATA_BATCH_CONCURRENCY = max(1, DB_POOL_MAX_SIZE // 2)
+
 app = FastAPI()
 
 app.add_middleware(
@@ -24,6 +52,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Table-Generation"],
 )
 
 # --- CORS (dynamisch aus config/ENV) ---
@@ -33,6 +62,7 @@ if FRONTEND_ORIGIN_REGEX:
         allow_origin_regex=FRONTEND_ORIGIN_REGEX,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "X-Table-Generation"],
         allow_credentials=False,  # kein "*" mit Credentials mischen
     )
 else:
@@ -41,6 +71,7 @@ else:
         allow_origins=FRONTEND_ORIGINS,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "X-Table-Generation"],
         allow_credentials=False,
     )
 
@@ -61,14 +92,35 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 # --- DB-Pool ---
 @app.on_event("startup")
 async def startup():
-    app.state.db = await asyncpg.create_pool(dsn=DB_URL)
+    app.state.db = await init_db_pool()
+    # Einbauort-Pfadspalten: einmalige Migration + Backfill (nicht mehr pro Request).
+    # Ohne die Spalten funktionieren die Stair-Hierarchy-Routen nicht -> Start abbrechen statt halb laufen.
+    try:
+        async with db_connection() as conn:
+            await ensure_einbauorte_paths(conn)
+    except Exception as e:
+        print(f"[ERROR] einbauorte path migration failed: {e}")
+        raise
+    # Unique-Index für den article_drafts-Upsert (/updateEdits, Edit-Puffer)
+    try:
+        async with db_connection() as conn:
+            await ensure_drafts_unique_index(conn)
+    except Exception as e:
+        print(f"[ERROR] article_drafts index migration failed: {e}")
+    doc_meta_watcher.start()
+    generation_listener.start()
+    # quittierte, noch nicht geflushte Edits (z. B. nach Worker-Neustart) nachziehen
+    await edit_buffer.start()
     if DEBUG:
         print(f"[DEBUG] Starte Backend")
         print(f"[DEBUG] views_to_show: {get_views_to_show}")
 
 @app.on_event("shutdown")
 async def shutdown():
-    await app.state.db.close()
+    await doc_meta_watcher.stop()
+    await generation_listener.stop()
+    await edit_buffer.stop()
+    await close_db_pool()
     if DEBUG:
         print("[DEBUG] DB-Pool wurde geschlossen.")
 
@@ -78,15 +130,313 @@ app.include_router(api_router)
 # --- Tabelle als HotTable-kompatibel abrufen ---
 @app.get("/api/tabledata")
 async def get_tabledata(
+    request: Request,
     table: str = Query(...),
-    limit: int = Query(500),
+    limit: int = Query(500, ge=1),
     project_id: int = Query(...),
     view_id: Optional[int] = Query(None),
+    offset: Optional[int] = Query(None, ge=0),
+    after: Optional[str] = Query(None),
+    before: Optional[str] = Query(None),
+    columns: Optional[str] = Query(None, description="Spaltenauswahl, kommagetrennt"),
+    filters: Optional[str] = Query(None, description='JSON: [{"col": "...", "op": "eq|ne|lt|le|gt|ge|contains|startswith|in|empty|notempty", "value": ...}]'),
+    sort: Optional[str] = Query(None, description='JSON: [{"col": "...", "dir": "asc|desc"}]'),
+    stream: Optional[str] = Query(None, pattern="^(json|ndjson)$", description="große Sheets chunkweise streamen"),
 ):
     if DEBUG:
         print(f"[DEBUG] Abfrage tabledata für Tabelle: {table}, Limit: {limit}, Project: {project_id}, View: {view_id}")
-    headers, data = await fetch_table_as_hotarray(DB_URL, table, limit, project_id)
-    # If headers are empty and data contains a DB error, return 404
-    if not headers and data and data[0][0].startswith("DB-Error:"):
-        return JSONResponse(status_code=404, content={"error": data[0][0]})
-    return {"headers": headers, "data": data}
+    # Accept: application/x-msgpack -> kompaktes Spaltenformat (siehe utils/table_encoding.py)
+    compact = wants_msgpack(request.headers.get("accept"))
+    try:
+        query = TableQuery.parse(columns, filters, sort)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if stream:
+        if after is not None or before is not None:
+            return JSONResponse(status_code=400, content={"error": "stream cannot be combined with after/before"})
+        return await _stream_tabledata(
+            table, project_id, limit, offset, query, stream, request.headers.get("if-none-match")
+        )
+    try:
+        payload, not_modified = await _resolve_tabledata(
+            table, project_id, limit, offset, after, before, compact, request.headers.get("if-none-match"), query
+        )
+    except TableDataError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": e.message})
+    headers = _cache_headers(payload.etag, payload.generation)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type=payload.media_type, headers=headers)
+
+
+async def _resolve_tabledata(
+    table: str,
+    project_id: int,
+    limit: int,
+    offset: Optional[int],
+    after: Optional[str],
+    before: Optional[str],
+    compact: bool,
+    if_none_match: Optional[str],
+    query: TableQuery = TableQuery(),
+) -> Tuple[CachedPayload, bool]:
+    """
+    Kodierte tabledata-Antwort: Cache -> Generation/ETag -> (coalesced) DB-Fetch.
+    Gibt (payload, not_modified) zurück; bei not_modified ist payload.body leer.
+    TableDataError bei ungültigen Parametern / DB-Fehlern.
+    """
+    windowed = offset is not None or after is not None or before is not None
+    fmt = "msgpack" if compact else "json"
+    media_type = MSGPACK_MEDIA_TYPE if compact else "application/json"
+
+    # 1) Cache-Hit: keine DB-Arbeit (Invalidierung per NOTIFY beim Rebuild)
+    cache_key = (table, project_id, (limit, offset, after, before), query, fmt)
+    cached = tabledata_cache.get(cache_key)
+    if cached is not None:
+        return cached, bool(cached.etag and _etag_matches(if_none_match, cached.etag))
+    epoch = tabledata_cache.epoch(table)
+
+    # 2) Generation VOR den Daten lesen: ein paralleler Rebuild kann so höchstens einen
+    #    unnötigen Refetch auslösen, nie ein falsches 304. Bewusst ein eigener (PK-)Lookup
+    #    statt Teil des Daten-Statements: nur so kann ein Revalidate (If-None-Match) mit 304
+    #    enden, ohne das Sheet zu lesen, und die Generation wird vor dem Fetch für den
+    #    Spalten-Metadaten-Cache und den Single-Flight-Key gebraucht. Warme Reads (Cache-Hit
+    #    oben) kosten gar keinen Roundtrip.
+    generation = await fetch_generation(table)
+    etag = _etag(generation, fmt, project_id, limit, offset, after, before, query)
+    if etag and _etag_matches(if_none_match, etag):
+        return CachedPayload(b"", media_type, etag, generation), True
+
+    # 3) Daten lesen + kodieren – gleichzeitige identische Requests (z. B. alle Clients
+    #    direkt nach remat_done) teilen sich einen Fetch und eine Kodierung
+    async def load() -> CachedPayload:
+        payload = await _load_tabledata(
+            table, limit, project_id, offset, after, before, compact, windowed, etag, generation, query
+        )
+        if generation is not None:
+            tabledata_cache.put(cache_key, payload, epoch)
+        return payload
+
+    return await tabledata_flight.do((cache_key, generation), load), False
+
+
+async def _stream_tabledata(table, project_id, limit, offset, query, fmt, if_none_match) -> Response:
+    """
+    Sheet per Server-Cursor in Chunks (TABLEDATA_STREAM_CHUNK_ROWS Zeilen) senden, ohne Cache:
+    Speicher pro Request bleibt begrenzt, die ersten Zeilen gehen sofort raus.
+      json:   {"headers": [...], "data": [[...], ...]} – gleiche Form wie ohne stream
+      ndjson: erste Zeile {"headers", "generation"}, danach eine Zeile pro Datensatz
+    """
+    generation = await fetch_generation(table)
+    etag = _etag(generation, f"{fmt}-stream", project_id, limit, offset, None, None, query)
+    headers = _cache_headers(etag, generation)
+    if etag and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        columns, sql, params = await prepare_table_stream(table, limit, project_id, offset, query, generation)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=404, content={"error": f"DB-Error: {e}"})
+
+    async def body():
+        chunks = iter_table_chunks(sql, params, TABLEDATA_STREAM_CHUNK_ROWS)
+        if fmt == "ndjson":
+            yield _json_bytes({"headers": columns, "generation": generation}) + b"\n"
+            async for chunk in chunks:
+                yield b"".join(_json_bytes(row) + b"\n" for row in chunk)
+            return
+        yield b'{"headers":' + _json_bytes(columns) + b',"data":['
+        first = True
+        async for chunk in chunks:
+            # Chunk als JSON-Array kodieren, äußere Klammern weg -> Zeilen an das offene Array hängen
+            yield (b"" if first else b",") + _json_bytes(chunk)[1:-1]
+            first = False
+        yield b"]}"
+
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+
+@app.post("/api/tabledata/batch")
+async def get_tabledata_batch(request: Request):
+    """
+    Mehrere Sheets in einem Request (z. B. beim Öffnen eines Projekts).
+    Body: {"project_id": 1, "sheets": [{"table": "...", "limit": 700, "offset": 0,
+                                          "after": null, "before": null, "etag": "\"12-json-…\"",
+                                          "columns": [...], "filters": [...], "sort": [...]}, ...]}
+    Die Sheets werden parallel auf Pool-Verbindungen gelesen (über Cache + Coalescing wie
+    /api/tabledata). Antwort: NDJSON, eine Zeile pro Sheet in Fertigstellungsreihenfolge:
+      {"table", "status": 200, "generation", "etag", "data": {headers, data, ...}}
+      {"table", "status": 304, "generation", "etag"}    (etag bzw. generation des Clients ist aktuell)
+      {"table", "status": 4xx, "error"}
+    Statt "etag" darf der Client "generation" schicken; verglichen wird dann mit dem ETag
+    für dasselbe Fenster und dieselbe Query. Nur JSON (kein msgpack).
+    """
+    body = await request.json()
+    project_id = body.get("project_id")
+    sheets = body.get("sheets") or []
+    if not isinstance(project_id, int) or not isinstance(sheets, list):
+        return JSONResponse(status_code=400, content={"error": "project_id and sheets required"})
+    for sheet in sheets:
+        if not isinstance(sheet, dict) or not isinstance(sheet.get("table"), str):
+            return JSONResponse(status_code=400, content={"error": "each sheet needs a table"})
+        limit = sheet.get("limit", 500)
+        offset = sheet.get("offset")
+        if not isinstance(limit, int) or limit < 1 or (offset is not None and (not isinstance(offset, int) or offset < 0)):
+            return JSONResponse(status_code=400, content={"error": f"invalid window for {sheet['table']}"})
+        try:
+            sheet["query"] = TableQuery.parse(sheet.get("columns"), sheet.get("filters"), sheet.get("sort"))
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": f"{sheet['table']}: {e}"})
+    if DEBUG:
+        print(f"[DEBUG] tabledata batch: {len(sheets)} sheet(s), Project: {project_id}")
+
+    semaphore = asyncio.Semaphore(TABLEDATA_BATCH_CONCURRENCY)
+
+    async def read(sheet: dict) -> bytes:
+        table = sheet["table"]
+        # bevorzugt das ETag, das der Client zu genau diesem Fenster/Query erhalten hat;
+        # sonst aus seiner Generation dasselbe ETag bilden, das /api/tabledata liefern würde
+        if_none_match = sheet.get("etag")
+        known = sheet.get("generation")
+        if not isinstance(if_none_match, str):
+            if_none_match = _etag(
+                known, "json", project_id, sheet.get("limit", 500), sheet.get("offset"),
+                sheet.get("after"), sheet.get("before"), sheet["query"],
+            ) if isinstance(known, int) else None
+        async with semaphore:
+            try:
+                payload, not_modified = await _resolve_tabledata(
+                    table, project_id, sheet.get("limit", 500), sheet.get("offset"),
+                    sheet.get("after"), sheet.get("before"), False, if_none_match, sheet["query"],
+                )
+            except TableDataError as e:
+                return _json_bytes({"table": table, "status": e.status_code, "error": e.message}) + b"\n"
+        if not_modified:
+            return _json_bytes({"table": table, "status": 304, "generation": payload.generation,
+                                "etag": payload.etag}) + b"\n"
+        head = _json_bytes({"table": table, "status": 200, "generation": payload.generation, "etag": payload.etag})
+        # bereits kodierten Body (ggf. aus dem Cache) unverändert einbetten
+        return head[:-1] + b',"data":' + payload.body + b"}\n"
+
+    async def stream():
+        for next_done in asyncio.as_completed([read(sheet) for sheet in sheets]):
+            yield await next_done
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/api/tabledata/delta")
+async def get_tabledata_delta(
+    table: str = Query(...),
+    project_id: int = Query(...),
+    since: int = Query(..., description="Generation des Clients (ETag / X-Table-Generation)"),
+):
+    """
+    Nur die seit `since` eingefügten, geänderten, gelöschten und verschobenen Zeilen.
+    410 = Generation nicht mehr vorgehalten -> Client lädt /api/tabledata komplett.
+    """
+    # nur Sheets des angefragten Projekts (materialized_*_{suffix}, wie utils/materialized.assert_belongs)
+    async with db_connection() as conn:
+        suffix = await conn.fetchval(
+            "SELECT project_materialized_name FROM projects WHERE id = $1 AND deleted_at IS NULL", project_id
+        )
+    if not suffix or not assert_belongs(table, suffix):
+        return JSONResponse(status_code=404, content={"error": f"table {table} not found in project {project_id}"})
+    try:
+        delta = await fetch_table_delta(table, since)
+    except GenerationExpired as e:
+        return JSONResponse(status_code=410, content={"error": str(e)})
+    except LookupError as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    if DEBUG:
+        print(f"[DEBUG] delta {table} {since}->{delta['generation']}: "
+              f"+{len(delta['inserted'])} ~{len(delta['updated'])} -{len(delta['deleted'])} ↕{len(delta['moved'])}")
+    return Response(content=_json_bytes(delta), media_type="application/json")
+
+
+class TableDataError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+async def _load_tabledata(table, limit, project_id, offset, after, before, compact, windowed, etag, generation,
+                          query: TableQuery = TableQuery()) -> CachedPayload:
+    if windowed:
+        # Fenster-Modus (Viewport + Prefetch): Keyset über order_key, mit total + Cursors
+        try:
+            window = await fetch_table_window(
+                table, limit, project_id, offset, after, before,
+                as_records=compact, query=query, generation=generation,
+            )
+        except (ValueError, asyncpg.DataError) as e:
+            # unbekannte Spalte / ungültiger Cursor / Filterwert passt nicht zum Spaltentyp
+            raise TableDataError(400, str(e))
+        except Exception as e:
+            raise TableDataError(404, f"DB-Error: {e}")
+        if compact:
+            headers, records = window.pop("headers"), window.pop("data")
+            body = encode_columnar_msgpack(headers, records, **window)
+        else:
+            body = _json_bytes(window)
+    elif not compact and TABLEDATA_JSON_MODE == "db":
+        # Postgres baut das komplette JSON -> keine Records/Listen in Python
+        try:
+            body = await fetch_table_json(table, limit, project_id, query=query, generation=generation)
+        except (ValueError, asyncpg.DataError) as e:
+            raise TableDataError(400, str(e))
+        except Exception as e:
+            raise TableDataError(404, f"DB-Error: {e}")
+    else:
+        try:
+            headers, data = await fetch_table_as_hotarray(
+                DB_URL, table, limit, project_id, as_records=compact, query=query, generation=generation,
+            )
+        except (ValueError, asyncpg.DataError) as e:
+            raise TableDataError(400, str(e))
+        # If headers are empty and data contains a DB error, return 404
+        if not headers and data and data[0][0].startswith("DB-Error:"):
+            raise TableDataError(404, data[0][0])
+        if compact:
+            body = encode_columnar_msgpack(headers, data)
+        else:
+            body = _json_bytes({"headers": headers, "data": data})
+    return CachedPayload(body, MSGPACK_MEDIA_TYPE if compact else "application/json", etag, generation)
+
+
+def _json_bytes(content) -> bytes:
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _etag(generation: Optional[int], fmt: str, project_id: int, limit: int, offset: Optional[int],
+          after: Optional[str], before: Optional[str], query: TableQuery) -> Optional[str]:
+    """
+    ETag = Generation + Format + Hash über Fenster und Query: gleiche Generation mit anderem
+    offset/limit/Cursor bzw. anderen columns/filters/sort ist eine andere Antwort (kein falsches 304).
+    repr() statt hash(): muss über Prozesse/Worker hinweg stabil sein.
+    """
+    if generation is None:
+        return None
+    variant = repr((project_id, limit, offset, after, before, tuple(query)))
+    digest = hashlib.md5(variant.encode("utf-8")).hexdigest()[:12]
+    return f'"{generation}-{fmt}-{digest}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def _cache_headers(etag: Optional[str], generation: Optional[int] = None) -> dict:
+    headers = {"Vary": "Accept"}
+    if etag:
+        headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+    if generation is not None:
+        # Basis für /api/tabledata/delta?since=
+        headers["X-Table-Generation"] = str(generation)
+    return headers
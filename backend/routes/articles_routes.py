@@ -1,69 +1,114 @@
-from fastapi import APIRouter, Request, Body
+from fastapi import APIRouter, Request, Body, Query, HTTPException
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
 from backend.settings.connection_points import engine
 from sqlalchemy import text
-from typing import Dict, Any
-from backend.articles.create_materialized_article_tables import materialize_articles_for_visualizer
+from typing import Dict, Any, List, Optional
+from backend.articles.article_match_engine import get_match_index, DEFAULT_TOP_K
+from backend.articles.create_materialized_article_tables import VIZ_TABLES, VIZ_POS_COLUMN
+
+MAX_PAGE_ROWS = 5000
+STREAM_CHUNK_ROWS = 1000
 
 router = APIRouter()
 
+def _ndjson_rows(table_name: str, select_sql: str, where_sql: str, page_sql: str, params: Dict[str, Any], headers: List[str]):
+    """NDJSON: erste Zeile {"headers": [...]}, danach eine JSON-Array-Zeile pro Datensatz (gleiche Seite wie json)."""
+    yield json.dumps({"headers": headers}, ensure_ascii=False) + "\n"
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=STREAM_CHUNK_ROWS).execute(text(
+            f'SELECT "{VIZ_POS_COLUMN}", {select_sql} FROM "{table_name}" {where_sql} '
+            f'ORDER BY "{VIZ_POS_COLUMN}"{page_sql}'
+        ), params)
+        for partition in result.partitions():
+            yield "".join(json.dumps(list(row[1:]), ensure_ascii=False, default=str) + "\n" for row in partition)
+
+
 @router.get("/articles_table")
-async def get_articles_table(request: Request, table: int = 5):
-    table_name = f"materialized_article_viz_{table}"
+async def get_articles_table(
+    request: Request,
+    table: int = 5,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_ROWS),
+    after: Optional[int] = Query(None, description="Keyset-Cursor: next_cursor der vorherigen Seite"),
+    columns: Optional[str] = Query(None, description="Kommagetrennte Spaltenauswahl"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    """
+    Artikel-Viz-Tabelle, optional seitenweise.
+    - limit + offset oder limit + after (Keyset über die Zeilenposition, stabil auch bei tiefen Seiten)
+    - columns=a,b,c liefert nur diese Spalten
+    - format=ndjson streamt die Zeilen statt eines großen JSON-Dokuments
+    Ohne Parameter: {"headers", "data"} wie bisher.
+    Reiner Lesepfad: die Viz-Tabellen baut die Match-Engine (bzw. der Import) neu, nicht dieser GET.
+    """
+    table_name = VIZ_TABLES.get(table, f"materialized_article_viz_{table}")
+    with engine.connect() as conn:
+        all_columns = list(conn.execute(text(f'SELECT * FROM "{table_name}" LIMIT 0')).keys())
+    visible = [c for c in all_columns if not c.startswith("__")]
+
+    if columns:
+        headers = [c.strip() for c in columns.split(",") if c.strip()]
+        unknown = [c for c in headers if c not in visible]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"unknown columns: {unknown}")
+    else:
+        headers = visible
+    select_sql = ", ".join(f'"{c}"' for c in headers) if headers else "NULL"
+
+    where_sql, params = "", {}
+    if after is not None:
+        where_sql, params = f'WHERE "{VIZ_POS_COLUMN}" > :after', {"after": after}
+
+    page_sql = ""
+    if limit is not None:
+        page_sql = " LIMIT :limit" + ("" if after is not None else " OFFSET :offset")
+        params.update(limit=limit, offset=offset)
+    elif offset:
+        page_sql = " OFFSET :offset"
+        params["offset"] = offset
+
+    if format == "ndjson":
+        return StreamingResponse(
+            _ndjson_rows(table_name, select_sql, where_sql, page_sql, params, headers),
+            media_type="application/x-ndjson",
+        )
+
     with engine.connect() as conn:
-        # Get column names
-        columns = [row[0] for row in conn.execute(text(f"""
-            SELECT column_name FROM information_schema.columns WHERE table_name = '{table_name}'
-        """)).fetchall()]
-        # Get all data
-        data = conn.execute(text(f"SELECT * FROM {table_name}")).fetchall()
-        data_rows = [list(row) for row in data]
-    return {"headers": columns, "data": data_rows}
+        rows = conn.execute(text(
+            f'SELECT "{VIZ_POS_COLUMN}", {select_sql} FROM "{table_name}" {where_sql} '
+            f'ORDER BY "{VIZ_POS_COLUMN}"{page_sql}'
+        ), params).fetchall()
+        response = {"headers": headers, "data": [list(row[1:]) for row in rows]}
+        if limit is not None:
+            response["total"] = conn.execute(text(f'SELECT COUNT(*) FROM "{table_name}"')).scalar()
+            response["next_cursor"] = rows[-1][0] if len(rows) == limit else None
+    return response
+
+def _parse_top_k(value) -> Optional[int]:
+    """top_k aus dem JSON-Body: null = alle Treffer, sonst ganze Zahl >= 1 (auch als String)."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise HTTPException(status_code=400, detail="top_k must be a positive integer or null")
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="top_k must be a positive integer or null")
+    if top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be a positive integer or null")
+    return top_k
+
 
 @router.post("/compare_article_draft")
 async def compare_article_draft(
     payload: Dict[str, Any] = Body(...)
 ):
-    materialize_articles_for_visualizer(1)
     draft_row = payload.get("draft_row", {})
     base_view_id = payload.get("base_view_id", 5)
-    table_name = f"materialized_article_viz_{base_view_id}"
-    with engine.connect() as conn:
-        columns = [row[0] for row in conn.execute(text(f"""
-            SELECT column_name FROM information_schema.columns WHERE table_name = '{table_name}'
-        """)).fetchall()]
-        data = conn.execute(text(f'SELECT * FROM {table_name}')).fetchall()
-        data_rows = [dict(zip(columns, row)) for row in data]
-    if base_view_id == 5:
-        data_rows = [row for row in data_rows if row.get("article_typ") == "Motor"]
-    elif base_view_id == 6:
-        data_rows = [row for row in data_rows if row.get("article_typ") != "Motor" or row.get("article_typ") is None]
-    def get_cell_matches(row, draft):
-        cell_matches = {}
-        matches = 0
-        mismatches = 0
-        for col in columns:
-            draft_val = draft.get(col, None)
-            if draft_val is not None and str(draft_val).strip() != "":
-                draft_val_str = str(draft_val).strip().lower()
-                cell_val_str = str(row.get(col, "")).strip().lower()
-                if draft_val_str in cell_val_str and cell_val_str != "":
-                    cell_matches[col] = "match"
-                    matches += 1
-                else:
-                    cell_matches[col] = "mismatch"
-                    mismatches += 1
-        return cell_matches, matches, mismatches
-    results = []
-    for row in data_rows:
-        cell_matches, matches, mismatches = get_cell_matches(row, draft_row)
-        if matches > 0:
-            perfect_match = mismatches == 0
-            results.append({
-                "row": row,
-                "cell_matches": cell_matches,
-                "matches": matches,
-                "mismatches": mismatches,
-                "perfect_match": perfect_match
-            })
-    results.sort(key=lambda x: (x["mismatches"], -x["matches"]))
-    return {"headers": columns, "results": results}
+    top_k = _parse_top_k(payload.get("top_k", DEFAULT_TOP_K))
+    # Viz-Tabellen nur neu bauen, wenn sich Artikel geändert haben; Index bleibt im Speicher
+    index = await asyncio.to_thread(get_match_index, base_view_id)
+    results = index.match(draft_row, top_k=top_k)
+    return {"headers": index.columns, "results": results}
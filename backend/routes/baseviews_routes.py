@@ -1,12 +1,11 @@
 from fastapi import APIRouter
 import sqlalchemy
-from backend.settings.connection_points import DB_URL
+from backend.settings.connection_points import engine
 
 router = APIRouter()
 
 @router.get("/baseviews")
 async def get_base_views():
-    engine = sqlalchemy.create_engine(DB_URL)
     with engine.connect() as conn:
         result = conn.execute(
             sqlalchemy.text("SELECT id, name_display FROM base_views")
@@ -6,34 +6,19 @@ if __name__ == "__main__":
 from fastapi import APIRouter
 import asyncpg
 from backend.settings.connection_points import DB_URL
+from backend.settings.db_pool import db_connection
+from backend.utils.column_registry import column_registry
 
 router = APIRouter()
 
 @router.get("/columns_map")
 async def get_columns_map():
-    conn = await asyncpg.connect(DB_URL)
-    # Get all columns from project_articles and articles, including data_source
-    result = await conn.fetch("""
-        SELECT c.name, c.name_external_german, c.data_source, 'project_articles' AS table_name
-        FROM columns c
-        WHERE c.name IN (
-            SELECT column_name FROM information_schema.columns WHERE table_name = 'project_articles'
-        )
-        UNION
-        SELECT c.name, c.name_external_german, c.data_source, 'articles' AS table_name
-        FROM columns c
-        WHERE c.name IN (
-            SELECT column_name FROM information_schema.columns WHERE table_name = 'articles'
-        )
-    """)
-    await conn.close()
+    async with db_connection() as conn:
+        # Spalten aus columns, die in project_articles / articles existieren (inkl. data_source)
+        result = (await column_registry.get(conn)).column_origins()
     # Group by column name, collect tables
     col_map = {}
-    for row in result:
-        name = row["name"]
-        ext = row["name_external_german"]
-        tbl = row["table_name"]
-        data_source = row["data_source"]
+    for name, ext, data_source, tbl in result:
         if name not in col_map:
             col_map[name] = {
                 "name": name,
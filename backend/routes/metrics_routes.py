@@ -0,0 +1,16 @@
+# backend/routes/metrics_routes.py
+from fastapi import APIRouter
+from backend.utils.tabledata_cache import tabledata_cache, tabledata_flight
+from backend.utils.column_registry import column_registry
+from backend.utils.edit_buffer import edit_buffer
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics():
+    return {
+        "tabledata_cache": tabledata_cache.metrics(),
+        "tabledata_single_flight": tabledata_flight.metrics(),
+        "column_registry": column_registry.metrics(),
+        "edit_buffer": edit_buffer.metrics(),
+    }
@@ -1,7 +1,8 @@
 # backend/routes/projects_routes.py
 from fastapi import APIRouter, Request, Query, HTTPException
 import sqlalchemy
-from backend.settings.connection_points import DB_URL
+from backend.settings.connection_points import engine
+from backend.utils.materialized import ensure_generations_table
 
 router = APIRouter()
 
@@ -10,7 +11,6 @@ router = APIRouter()
 # -------------------------------------------------------------------
 @router.get("/projects")
 async def get_projects():
-    engine = sqlalchemy.create_engine(DB_URL)
     with engine.connect() as conn:
         rows = conn.execute(sqlalchemy.text("""
             SELECT id, name
@@ -30,7 +30,6 @@ async def create_project(request: Request):
     if not raw_name:
         return {"success": False, "error": "name required"}
 
-    engine = sqlalchemy.create_engine(DB_URL)
     with engine.begin() as conn:
         # Duplikat-Guard auf Suffix der aktiven Projekte
         exists = conn.execute(sqlalchemy.text("""
@@ -111,6 +110,20 @@ def _drop_materialized_for_suffix(conn: sqlalchemy.engine.Connection,
         except Exception as e:
             print(f"[DROP TABLE warn] {name}: {e}")
 
+    # Generation + Delta-Snapshots mit wegwerfen: sonst bestätigt ein altes ETag (If-None-Match -> 304)
+    # eine Tabelle, die es nicht mehr gibt. Neu angelegt bekommt sie eine neue Generation (Sequenz).
+    ensure_generations_table()
+    conn.execute(sqlalchemy.text(
+        "DELETE FROM materialized_generations WHERE table_name = ANY(:names)"
+    ), {"names": tables})
+    conn.execute(sqlalchemy.text(
+        "DELETE FROM materialized_row_hashes WHERE table_name = ANY(:names)"
+    ), {"names": tables})
+
+    # gecachte /api/tabledata-Antworten der gedroppten Sheets verwerfen (Zustellung beim Commit)
+    for name in tables:
+        conn.execute(sqlalchemy.text("SELECT pg_notify('materialized_changed', :n)"), {"n": name})
+
     return dropped
 
 # -------------------------------------------------------------------
@@ -121,7 +134,6 @@ async def delete_project_soft(project_id: int, mode: str = Query("soft")):
     if mode != "soft":
         raise HTTPException(status_code=400, detail="only soft delete supported here")
 
-    engine = sqlalchemy.create_engine(DB_URL)
     with engine.begin() as conn:
         # nur aktive Projekte
         suffix = conn.execute(sqlalchemy.text("""
@@ -148,7 +160,6 @@ async def delete_project_soft(project_id: int, mode: str = Query("soft")):
 # -------------------------------------------------------------------
 @router.get("/projects/{project_id}/info")
 async def get_project_info(project_id: int):
-    engine = sqlalchemy.create_engine(DB_URL)
     with engine.connect() as conn:
         # Get project info
         project_row = conn.execute(sqlalchemy.text("""
@@ -189,7 +200,6 @@ async def update_project_cad_db_path(project_id: int, request: Request):
     new_path = body.get("cad_db_path")
     if not new_path:
         raise HTTPException(status_code=400, detail="Missing cad_db_path")
-    engine = sqlalchemy.create_engine(DB_URL)
     with engine.begin() as conn:
         result = conn.execute(sqlalchemy.text("""
             UPDATE projects SET project_cad_db_path = :path WHERE id = :id AND deleted_at IS NULL
@@ -1,7 +1,7 @@
 # backend/routes/sheetnames_routes.py
 from fastapi import APIRouter, Query
 import sqlalchemy
-from backend.settings.connection_points import DB_URL
+from backend.settings.connection_points import engine
 
 router = APIRouter()
 MATERIALIZED_PREFIX = "materialized_"
@@ -26,7 +26,6 @@ def _get_active_view_names(conn: sqlalchemy.engine.Connection, project_id: int)
 
 @router.get("/sheetnames")
 async def get_sheet_names(project_id: int = Query(...)) -> list[str]:
-    engine = sqlalchemy.create_engine(DB_URL)
     with engine.connect() as conn:
         suffix = _get_project_suffix(conn, project_id)
         if not suffix:
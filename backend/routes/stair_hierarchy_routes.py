@@ -1,48 +1,50 @@
 from fastapi import APIRouter, Request, Query, HTTPException
-import asyncpg
-from backend.settings.connection_points import DB_URL
-from backend.einbauorte.create_materialized_einbauorte import rematerialize_project_einbauorte
+from typing import Optional
+from backend.settings.db_pool import db_connection
+from backend.einbauorte.create_materialized_einbauorte import (
+    rematerialize_project_einbauorte,
+    refresh_einbauorte_subtrees,
+    fetch_subtree_ids,
+    remove_einbauorte,
+    set_node_path,
+    sync_subtree_paths,
+    detach_subtree_paths,
+    repair_einbauorte_paths,
+)
 
 router = APIRouter()
 
 @router.get("/stairhierarchy")
 async def get_stair_elements(project_id: int = Query(...)):
-    conn = await asyncpg.connect(DB_URL)
-
-    async def build_tree(parent_id):
+    async with db_connection() as conn:
+        # ein Query, Baum aus parent_id (nicht aus den gespeicherten Pfaden: Knoten aus Importen o. Ä.
+        # haben evtl. noch keinen); Sortierpfad liefert Eltern immer vor ihren Kindern
         rows = await conn.fetch("""
-            SELECT id, name, sort_order
-            FROM stair_element_einbauorte
-            WHERE parent_id = $1
-            ORDER BY sort_order
-        """, parent_id)
-        return [
-            {
-                "id": r["id"],
-                "name": r["name"],
-                "sort_order": r["sort_order"],
-                "children": await build_tree(r["id"])
-            }
-            for r in rows
-        ]
-
-    roots = await conn.fetch("""
-        SELECT id, name, sort_order
-        FROM stair_element_einbauorte
-        WHERE parent_id IS NULL AND project_id = $1
-        ORDER BY sort_order
-    """, project_id)
+            WITH RECURSIVE t AS (
+                SELECT id, parent_id, name, sort_order, ARRAY[sort_order] AS sort_path
+                FROM stair_element_einbauorte
+                WHERE parent_id IS NULL AND project_id = $1
+                UNION ALL
+                SELECT c.id, c.parent_id, c.name, c.sort_order, t.sort_path || c.sort_order
+                FROM t
+                JOIN stair_element_einbauorte c ON c.parent_id = t.id
+            )
+            SELECT id, parent_id, name, sort_order FROM t
+            ORDER BY sort_path, id
+        """, project_id)
 
+    nodes = {}
     tree = []
-    for r in roots:
-        tree.append({
+    for r in rows:
+        node = {
             "id": r["id"],
             "name": r["name"],
             "sort_order": r["sort_order"],
-            "children": await build_tree(r["id"])
-        })
-
-    await conn.close()
+            "children": []
+        }
+        nodes[r["id"]] = node
+        parent = nodes.get(r["parent_id"])
+        (parent["children"] if parent else tree).append(node)
     return tree
 
 
@@ -50,51 +52,93 @@ async def get_stair_elements(project_id: int = Query(...)):
 @router.post("/stairhierarchy")
 async def insert_stair_element(request: Request):
     data = await request.json()
-    conn = await asyncpg.connect(DB_URL)
-
-    parent_id = data.get("parent_id")
-
-    # project_id sicher ermitteln (Root: aus Payload; Kind: vom Parent übernehmen)
-    if parent_id is None:
-        project_id = data.get("project_id")
-        if project_id is None:
-            await conn.close()
-            raise HTTPException(status_code=400, detail="project_id required for root")
-    else:
-        row = await conn.fetchrow(
-            "SELECT project_id FROM stair_element_einbauorte WHERE id = $1",
-            parent_id
-        )
-        if not row:
-            await conn.close()
-            raise HTTPException(status_code=400, detail="parent not found")
-        project_id = row["project_id"]
-
-    # sort_order: an das Ende der Geschwistergruppe
-    next_sort = await conn.fetchval("""
-        SELECT COALESCE(MAX(sort_order) + 1, 1)
-        FROM stair_element_einbauorte
-        WHERE project_id = $1
-          AND parent_id IS NOT DISTINCT FROM $2
-    """, project_id, parent_id)
-
-    await conn.execute("""
-        INSERT INTO stair_element_einbauorte (project_id, name, parent_id, sort_order)
-        VALUES ($1, $2, $3, $4)
-    """, project_id, data["name"], parent_id, next_sort)
-
-    await conn.close()
-    return {"status": "ok"}
+    async with db_connection() as conn:
+        parent_id = data.get("parent_id")
+
+        # project_id sicher ermitteln (Root: aus Payload; Kind: vom Parent übernehmen)
+        if parent_id is None:
+            project_id = data.get("project_id")
+            if project_id is None:
+                raise HTTPException(status_code=400, detail="project_id required for root")
+        else:
+            row = await conn.fetchrow(
+                "SELECT project_id FROM stair_element_einbauorte WHERE id = $1",
+                parent_id
+            )
+            if not row:
+                raise HTTPException(status_code=400, detail="parent not found")
+            project_id = row["project_id"]
+
+        try:
+            await conn.execute("BEGIN")
+
+            # sort_order: an das Ende der Geschwistergruppe
+            next_sort = await conn.fetchval("""
+                SELECT COALESCE(MAX(sort_order) + 1, 1)
+                FROM stair_element_einbauorte
+                WHERE project_id = $1
+                  AND parent_id IS NOT DISTINCT FROM $2
+            """, project_id, parent_id)
+
+            await repair_einbauorte_paths(conn, project_id)
+            new_id = await conn.fetchval("""
+                INSERT INTO stair_element_einbauorte (project_id, name, parent_id, sort_order)
+                VALUES ($1, $2, $3, $4)
+                RETURNING id
+            """, project_id, data["name"], parent_id, next_sort)
+            await set_node_path(conn, new_id)
+
+            # neuer Knoten + Parent (wird ggf. vom Leaf zum Branch "[!]")
+            changed = set(await refresh_einbauorte_subtrees(conn, project_id, [new_id]))
+            if parent_id is not None:
+                changed.update(await refresh_einbauorte_subtrees(
+                    conn, project_id, [parent_id], include_descendants=False
+                ))
+
+            await conn.execute("COMMIT")
+            return {"status": "ok", "id": new_id, "changed_ids": sorted(changed)}
+        except Exception:
+            await conn.execute("ROLLBACK")
+            raise
 
 
 @router.delete("/stairhierarchy/{id}")
 async def delete_stair_element(id: int):
-    conn = await asyncpg.connect(DB_URL)
-    await conn.execute("""
-        DELETE FROM stair_element_einbauorte WHERE id = $1
-    """, id)
-    await conn.close()
-    return {"status": "deleted"}
+    async with db_connection() as conn:
+        try:
+            await conn.execute("BEGIN")
+
+            row = await conn.fetchrow("""
+                SELECT project_id, parent_id
+                FROM stair_element_einbauorte
+                WHERE id = $1
+                FOR UPDATE
+            """, id)
+            subtree_ids = []
+            if row:
+                await repair_einbauorte_paths(conn, row["project_id"])
+                subtree_ids = await fetch_subtree_ids(conn, row["project_id"], id)
+                await detach_subtree_paths(conn, row["project_id"], id)
+
+            await conn.execute("""
+                DELETE FROM stair_element_einbauorte WHERE id = $1
+            """, id)
+
+            changed: set[int] = set()
+            if row:
+                # Teilbaum ist danach nicht mehr erreichbar -> materialisierte Zeilen entfernen
+                changed.update(await remove_einbauorte(conn, row["project_id"], subtree_ids))
+                # Parent kann dadurch wieder zum Leaf werden
+                if row["parent_id"] is not None:
+                    changed.update(await refresh_einbauorte_subtrees(
+                        conn, row["project_id"], [row["parent_id"]], include_descendants=False
+                    ))
+
+            await conn.execute("COMMIT")
+            return {"status": "deleted", "changed_ids": sorted(changed)}
+        except Exception:
+            await conn.execute("ROLLBACK")
+            raise
 
 
 # --------- MOVE: atomarer Tausch + korrekt nach project_id filtern ---------
@@ -104,73 +148,88 @@ async def move_element(request: Request):
     el_id = int(data["id"])
     direction = -1 if int(data["direction"]) < 0 else 1
 
-    conn = await asyncpg.connect(DB_URL)
-    try:
-        await conn.execute("BEGIN")
-
-        # zu bewegendes Element sperren + project_id holen
-        row = await conn.fetchrow("""
-            SELECT id, project_id, parent_id, sort_order
-            FROM stair_element_einbauorte
-            WHERE id = $1
-            FOR UPDATE
-        """, el_id)
-        if not row:
-            await conn.execute("ROLLBACK")
-            raise HTTPException(status_code=404, detail="not found")
-
-        # direkten Nachbarn in gleicher Gruppe sperren
-        neigh = await conn.fetchrow("""
-            SELECT id, sort_order
-            FROM stair_element_einbauorte
-            WHERE project_id = $1
-              AND parent_id IS NOT DISTINCT FROM $2
-              AND sort_order = $3
-            FOR UPDATE
-        """, row["project_id"], row["parent_id"], row["sort_order"] + direction)
-
-        if not neigh:
+    async with db_connection() as conn:
+        try:
+            await conn.execute("BEGIN")
+
+            # zu bewegendes Element sperren + project_id holen
+            row = await conn.fetchrow("""
+                SELECT id, project_id, parent_id, sort_order
+                FROM stair_element_einbauorte
+                WHERE id = $1
+                FOR UPDATE
+            """, el_id)
+            if not row:
+                await conn.execute("ROLLBACK")
+                raise HTTPException(status_code=404, detail="not found")
+
+            # direkten Nachbarn in gleicher Gruppe sperren
+            neigh = await conn.fetchrow("""
+                SELECT id, sort_order
+                FROM stair_element_einbauorte
+                WHERE project_id = $1
+                  AND parent_id IS NOT DISTINCT FROM $2
+                  AND sort_order = $3
+                FOR UPDATE
+            """, row["project_id"], row["parent_id"], row["sort_order"] + direction)
+
+            if not neigh:
+                await conn.execute("ROLLBACK")
+                return {"status": "noop"}  # oben/unten, nichts zu tun
+
+            # atomarer Swap in EINEM UPDATE
+            await conn.execute("""
+                UPDATE stair_element_einbauorte
+                SET sort_order = CASE
+                    WHEN id = $1 THEN $4
+                    WHEN id = $2 THEN $3
+                    ELSE sort_order
+                END
+                WHERE id IN ($1, $2)
+            """, row["id"], neigh["id"], row["sort_order"], neigh["sort_order"])
+
+            # Positionspräfix beider Teilbäume hat sich geändert
+            await repair_einbauorte_paths(conn, row["project_id"])
+            await sync_subtree_paths(conn, row["project_id"], [row["id"], neigh["id"]])
+            changed = await refresh_einbauorte_subtrees(
+                conn, row["project_id"], [row["id"], neigh["id"]]
+            )
+
+            await conn.execute("COMMIT")
+            return {"status": "ok", "changed_ids": changed}
+        except Exception:
             await conn.execute("ROLLBACK")
-            return {"status": "noop"}  # oben/unten, nichts zu tun
-
-        # atomarer Swap in EINEM UPDATE
-        await conn.execute("""
-            UPDATE stair_element_einbauorte
-            SET sort_order = CASE
-                WHEN id = $1 THEN $4
-                WHEN id = $2 THEN $3
-                ELSE sort_order
-            END
-            WHERE id IN ($1, $2)
-        """, row["id"], neigh["id"], row["sort_order"], neigh["sort_order"])
-
-        await conn.execute("COMMIT")
-        return {"status": "ok"}
-    except Exception:
-        await conn.execute("ROLLBACK")
-        raise
-    finally:
-        await conn.close()
+            raise
 
 
 @router.get("/rematerialize_einbauorte")
 @router.post("/rematerialize_einbauorte")
 async def rematerialize(project_id: int = Query(...)):
-    conn = await asyncpg.connect(DB_URL)
-    count = await rematerialize_project_einbauorte(conn, project_id)
-    await conn.close()
+    async with db_connection() as conn:
+        async with conn.transaction():
+            count = await rematerialize_project_einbauorte(conn, project_id)
     return {"status": "ok", "count": count}
 
 @router.get("/materialized_einbauorte")
-async def get_materialized(project_id: int = Query(...)):
-    conn = await asyncpg.connect(DB_URL)
-    rows = await conn.fetch("""
-        SELECT id, full_name
-        FROM materialized_einbauorte
-        WHERE project_id = $1
-        ORDER BY full_name
-    """, project_id)
-    await conn.close()
+async def get_materialized(project_id: int = Query(...), under: Optional[int] = Query(None)):
+    async with db_connection() as conn:
+        if under is None:
+            rows = await conn.fetch("""
+                SELECT id, full_name
+                FROM materialized_einbauorte
+                WHERE project_id = $1
+                ORDER BY full_name
+            """, project_id)
+        else:
+            # "alle Einbauorte unter X" = Range über id_path
+            await repair_einbauorte_paths(conn, project_id)
+            subtree_ids = await fetch_subtree_ids(conn, project_id, under)
+            rows = await conn.fetch("""
+                SELECT id, full_name
+                FROM materialized_einbauorte
+                WHERE project_id = $1 AND id = ANY($2::int[])
+                ORDER BY full_name
+            """, project_id, subtree_ids)
     return [{"id": r["id"], "label": r["full_name"]} for r in rows]
 
 
@@ -181,19 +240,30 @@ async def rename_stair_element(id: int, request: Request):
     if not isinstance(new_name, str) or not new_name.strip():
         raise HTTPException(status_code=400, detail="name required")
 
-    conn = await asyncpg.connect(DB_URL)
-    try:
-        result = await conn.execute(
-            "UPDATE stair_element_einbauorte SET name = $1 WHERE id = $2",
-            new_name.strip(), id
-        )
-    finally:
-        await conn.close()
-
-    if not result.endswith(" 1"):
-        raise HTTPException(status_code=404, detail="element not found")
+    async with db_connection() as conn:
+        try:
+            await conn.execute("BEGIN")
+            project_id = await conn.fetchval(
+                "UPDATE stair_element_einbauorte SET name = $1 WHERE id = $2 RETURNING project_id",
+                new_name.strip(), id
+            )
+            if project_id is None:
+                await conn.execute("ROLLBACK")
+                raise HTTPException(status_code=404, detail="element not found")
+
+            # Namenspfad des ganzen Teilbaums ändert sich
+            await repair_einbauorte_paths(conn, project_id)
+            await sync_subtree_paths(conn, project_id, [id])
+            changed = await refresh_einbauorte_subtrees(conn, project_id, [id])
+
+            await conn.execute("COMMIT")
+        except HTTPException:
+            raise
+        except Exception:
+            await conn.execute("ROLLBACK")
+            raise
 
-    return {"status": "ok", "id": id, "name": new_name.strip()}
+    return {"status": "ok", "id": id, "name": new_name.strip(), "changed_ids": changed}
 
 
 @router.post("/stairhierarchy/reorder")
@@ -220,46 +290,50 @@ async def reorder_siblings(request: Request):
     if len(ordered_ids) == 0:
         return {"status": "ok"}  # nichts zu tun
 
-    conn = await asyncpg.connect(DB_URL)
-    try:
-        await conn.execute("BEGIN")
-
-        # 1) Hole *alle* Geschwister-IDs dieser Gruppe (und sperre sie)
-        sibling_rows = await conn.fetch("""
-            SELECT id
-            FROM stair_element_einbauorte
-            WHERE project_id = $1
-              AND parent_id IS NOT DISTINCT FROM $2
-            ORDER BY sort_order
-            FOR UPDATE
-        """, project_id, parent_id)
-
-        sibling_ids = [r["id"] for r in sibling_rows]
-
-        # 2) Validierung: gleiche Menge?
-        if set(sibling_ids) != set(ordered_ids) or len(sibling_ids) != len(ordered_ids):
+    async with db_connection() as conn:
+        try:
+            await conn.execute("BEGIN")
+
+            # 1) Hole *alle* Geschwister-IDs dieser Gruppe (und sperre sie)
+            sibling_rows = await conn.fetch("""
+                SELECT id
+                FROM stair_element_einbauorte
+                WHERE project_id = $1
+                  AND parent_id IS NOT DISTINCT FROM $2
+                ORDER BY sort_order
+                FOR UPDATE
+            """, project_id, parent_id)
+
+            sibling_ids = [r["id"] for r in sibling_rows]
+
+            # 2) Validierung: gleiche Menge?
+            if set(sibling_ids) != set(ordered_ids) or len(sibling_ids) != len(ordered_ids):
+                await conn.execute("ROLLBACK")
+                raise HTTPException(
+                    status_code=400,
+                    detail="ordered_ids must match exactly the sibling set for given project_id/parent_id"
+                )
+
+            # 3) sort_order = 1..n gemäß Reihenfolge der ordered_ids
+            #    Effizient per UPDATE FROM (unnest)
+            new_orders = list(range(1, len(ordered_ids) + 1))
+            await conn.execute("""
+                UPDATE stair_element_einbauorte t
+                SET sort_order = v.new_order
+                FROM (
+                    SELECT UNNEST($1::int[]) AS id, UNNEST($2::int[]) AS new_order
+                ) AS v
+                WHERE t.id = v.id
+            """, ordered_ids, new_orders)
+
+            await repair_einbauorte_paths(conn, project_id)
+            await sync_subtree_paths(conn, project_id, ordered_ids)
+
+            # nur Teilbäume, deren Position sich wirklich verschoben hat, liefern Änderungen
+            changed = await refresh_einbauorte_subtrees(conn, project_id, ordered_ids)
+
+            await conn.execute("COMMIT")
+            return {"status": "ok", "count": len(ordered_ids), "changed_ids": changed}
+        except Exception:
             await conn.execute("ROLLBACK")
-            raise HTTPException(
-                status_code=400,
-                detail="ordered_ids must match exactly the sibling set for given project_id/parent_id"
-            )
-
-        # 3) sort_order = 1..n gemäß Reihenfolge der ordered_ids
-        #    Effizient per UPDATE FROM (unnest)
-        new_orders = list(range(1, len(ordered_ids) + 1))
-        await conn.execute("""
-            UPDATE stair_element_einbauorte t
-            SET sort_order = v.new_order
-            FROM (
-                SELECT UNNEST($1::int[]) AS id, UNNEST($2::int[]) AS new_order
-            ) AS v
-            WHERE t.id = v.id
-        """, ordered_ids, new_orders)
-
-        await conn.execute("COMMIT")
-        return {"status": "ok", "count": len(ordered_ids)}
-    except Exception:
-        await conn.execute("ROLLBACK")
-        raise
-    finally:
-        await conn.close()
\ No newline at end of file
+            raise
\ No newline at end of file
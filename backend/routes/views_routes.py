@@ -1,7 +1,7 @@
 # backend/routes/views_routes.py
 from fastapi import APIRouter, Request, HTTPException
-from sqlalchemy import create_engine, text
-from backend.settings.connection_points import DB_URL
+from sqlalchemy import text
+from backend.settings.connection_points import engine
 from backend.loading.create_materialized_tables import create_materialized_table
 from backend.SSE.event_bus import publish
 import pymssql
@@ -21,7 +21,6 @@ async def set_header_rows_by_sheet(request: Request):
     if "elektrik" in sheet_name and header is False:
         raise HTTPException(status_code=400, detail="Elektrik-Sheets erfordern header_rows=true")
 
-    engine = create_engine(DB_URL)
     with engine.begin() as conn:
         # Spalte idempotent sicherstellen
         conn.execute(text("""
@@ -67,7 +66,6 @@ async def get_view_id(request: Request):
     project_id = int(b["project_id"])
     sheet_name = str(b["sheet_name"]).lower()
 
-    engine = create_engine(DB_URL)
     with engine.begin() as conn:
         row = conn.execute(text("""
             SELECT v.id AS view_id
@@ -88,7 +86,6 @@ async def get_view_id_get(request: Request):
     sheet_name = request.query_params.get("sheet_name")
     if not project_id or not sheet_name:
         raise HTTPException(400, "Missing project_id or sheet_name")
-    engine = create_engine(DB_URL)
     with engine.begin() as conn:
         row = conn.execute(text("""
             SELECT v.id AS view_id
@@ -106,7 +103,6 @@ async def list_views(request: Request):
     project_id = request.query_params.get("project_id")
     if not project_id:
         raise HTTPException(400, "Missing project_id")
-    engine = create_engine(DB_URL)
     with engine.begin() as conn:
         rows = conn.execute(text("""
             SELECT v.id, v.name, v.cad_drawing_guid, v.cad_drawing_title
@@ -140,7 +136,6 @@ async def soft_delete_view(request: Request):
     if not isinstance(project_id, int) or not isinstance(sheet_name, str):
         raise HTTPException(status_code=400, detail="project_id(int) & sheet_name(str) required")
 
-    engine = create_engine(DB_URL)
     with engine.begin() as conn:
         # exakter Vergleich des vollständigen Namens (case-insensitive)
         row = conn.execute(
@@ -170,7 +165,6 @@ async def connect_drawing_to_view(view_id: int, request: Request):
     if not drawing_title:
         raise HTTPException(status_code=400, detail="Missing drawing_title")
     # Get the CAD DB path for the project
-    engine = create_engine(DB_URL)
     with engine.begin() as conn:
         # Get project_id for the view
         project_row = conn.execute(text("SELECT project_id FROM views WHERE id = :vid"), {"vid": view_id}).fetchone()
@@ -13,6 +13,23 @@ config = json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
 DB_URL: str = config["DB_URL"]
 BACKEND_URL: str = config.get("BACKEND_URL", "")
 ARTICLE_DOCUMENTATION_PATH: str = config["ARTICLE_DOCUMENTATION_PATH"]
+# Doku-Zähler live halten: "auto" (inotify unter Linux, sonst Polling) | "inotify" | "poll" | "off"
+DOC_META_WATCHER: str = os.getenv("DOC_META_WATCHER") or config.get("DOC_META_WATCHER", "auto")
+DOC_META_POLL_INTERVAL: float = float(os.getenv("DOC_META_POLL_INTERVAL") or config.get("DOC_META_POLL_INTERVAL", 30))
+# asyncpg-Pool (siehe settings/db_pool.py); ENV hat Vorrang vor config.json
+DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE") or config.get("DB_POOL_MIN_SIZE", 2))
+DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE") or config.get("DB_POOL_MAX_SIZE", 20))
+DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE") or config.get("DB_STATEMENT_CACHE_SIZE", 256))
+DB_ACQUIRE_TIMEOUT: float = float(os.getenv("DB_ACQUIRE_TIMEOUT") or config.get("DB_ACQUIRE_TIMEOUT", 10))
+# /api/tabledata: In-Process-Cache kodierter Antworten (Bytes; 0 = aus)
+TABLEDATA_CACHE_MAX_BYTES: int = int(os.getenv("TABLEDATA_CACHE_MAX_BYTES") or config.get("TABLEDATA_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# /api/tabledata (JSON, ganzes Sheet): "python" = Records -> Listen -> json.dumps, "db" = Postgres baut das JSON (json_agg)
+TABLEDATA_JSON_MODE: str = (os.getenv("TABLEDATA_JSON_MODE") or config.get("TABLEDATA_JSON_MODE", "python")).lower()
+# /api/tabledata?stream=json|ndjson: Zeilen pro Cursor-Fetch (= pro gesendetem Chunk)
+TABLEDATA_STREAM_CHUNK_ROWS: int = int(os.getenv("TABLEDATA_STREAM_CHUNK_ROWS") or config.get("TABLEDATA_STREAM_CHUNK_ROWS", 1000))
+# /api/bufferEdits: Flush spätestens nach EDIT_BUFFER_FLUSH_INTERVAL s oder ab EDIT_BUFFER_MAX_EDITS offenen Zellen
+EDIT_BUFFER_FLUSH_INTERVAL: float = float(os.getenv("EDIT_BUFFER_FLUSH_INTERVAL") or config.get("EDIT_BUFFER_FLUSH_INTERVAL", 0.3))
+EDIT_BUFFER_MAX_EDITS: int = int(os.getenv("EDIT_BUFFER_MAX_EDITS") or config.get("EDIT_BUFFER_MAX_EDITS", 500))
 # DEBUG aus ENV überschreibbar (default True wie bisher)
 DEBUG: bool = (os.getenv("DEBUG", "1") == "1")
 
@@ -29,7 +46,20 @@ if FRONTEND_ORIGINS is None:
 FRONTEND_ORIGIN_REGEX = config.get("FRONTEND_ORIGIN_REGEX") or os.getenv("FRONTEND_ORIGIN_REGEX")
 
 # --- Sync SQLAlchemy (dein bestehender Code) ---
-engine = create_engine(DB_URL)
+# EINE Engine pro Prozess: alle sync Aufrufer (Routes, Materialisierung) teilen sich ihren Pool
+SQLA_POOL_SIZE: int = int(os.getenv("SQLA_POOL_SIZE") or config.get("SQLA_POOL_SIZE", 10))
+SQLA_MAX_OVERFLOW: int = int(os.getenv("SQLA_MAX_OVERFLOW") or config.get("SQLA_MAX_OVERFLOW", 10))
+SQLA_POOL_TIMEOUT: float = float(os.getenv("SQLA_POOL_TIMEOUT") or config.get("SQLA_POOL_TIMEOUT", 10))
+SQLA_POOL_RECYCLE: int = int(os.getenv("SQLA_POOL_RECYCLE") or config.get("SQLA_POOL_RECYCLE", 1800))
+
+engine = create_engine(
+    DB_URL,
+    pool_size=SQLA_POOL_SIZE,
+    max_overflow=SQLA_MAX_OVERFLOW,
+    pool_timeout=SQLA_POOL_TIMEOUT,
+    pool_recycle=SQLA_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
 Session = sessionmaker(bind=engine)
 
 def get_views_for_project(project_id: int):
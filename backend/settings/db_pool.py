@@ -0,0 +1,70 @@
+# backend/settings/db_pool.py
+"""
+Process-wide asyncpg pool for all async handlers.
+- Created on app startup (init_db_pool), lazily on first use otherwise (scripts).
+- Size, statement cache and acquire timeout come from config.json / ENV
+  (DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_CACHE_SIZE, DB_ACQUIRE_TIMEOUT).
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import asyncpg
+
+from backend.settings.connection_points import (
+    DB_URL,
+    DEBUG,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_ACQUIRE_TIMEOUT,
+)
+
+_pool: Optional[asyncpg.Pool] = None
+_pool_lock = asyncio.Lock()
+
+
+async def init_db_pool() -> asyncpg.Pool:
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                dsn=DB_URL,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+            )
+            if DEBUG:
+                print(f"[DEBUG] DB-Pool bereit (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+    return _pool
+
+
+async def close_db_pool() -> None:
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+
+async def get_db_pool() -> asyncpg.Pool:
+    return _pool if _pool is not None else await init_db_pool()
+
+
+@asynccontextmanager
+async def db_connection(dsn: Optional[str] = None):
+    """
+    Verbindung aus dem Pool (Timeout beim Warten auf eine freie Verbindung: DB_ACQUIRE_TIMEOUT).
+    Eine abweichende dsn bekommt eine eigene, kurzlebige Verbindung.
+    """
+    if dsn is not None and dsn != DB_URL:
+        conn = await asyncpg.connect(dsn=dsn)
+        try:
+            yield conn
+        finally:
+            await conn.close()
+        return
+    pool = await get_db_pool()
+    async with pool.acquire(timeout=DB_ACQUIRE_TIMEOUT) as conn:
+        yield conn
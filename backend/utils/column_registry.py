@@ -0,0 +1,152 @@
+# backend/utils/column_registry.py
+"""
+Versionierte In-Memory-Registry der Spaltenzuordnung (columns-Tabelle + Spalten der Quelltabellen).
+Geteilt von /updateEdits, /columns_map und den Materializern.
+
+Version = Fingerprint aus
+- pg_class (oid, xmin) von columns / project_articles / articles / article_drafts:
+  ALTER TABLE (z. B. ADD COLUMN durch den Importer) oder Neuanlage ändert die pg_class-Zeile,
+- md5 über den Inhalt der (kleinen) columns-Tabelle,
+- md5 über pg_attribute (Name, Typ, typmod, dropped) der Quelltabellen: fängt Spaltenänderungen ab,
+  die die pg_class-Zeile nicht neu schreiben (RENAME COLUMN, varchar-Länge ohne Rewrite, ...).
+Der Fingerprint ist eine billige Katalog-Abfrage; die eigentlichen Ladequeries laufen nur,
+wenn er sich geändert hat – auch wenn die Änderung aus einem anderen Prozess kommt (Importer-CLI).
+Gleiches SQL für asyncpg (get) und psycopg2 (get_sync).
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+SOURCE_TABLES = ("project_articles", "articles", "article_drafts")
+
+_VERSION_SQL = """
+    SELECT COALESCE((
+        SELECT string_agg(c.relname || ':' || c.oid::text || ':' || c.xmin::text, ',' ORDER BY c.relname)
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+          AND c.relname IN ('columns', 'project_articles', 'articles', 'article_drafts')
+    ), '') || '|' || (
+        SELECT COALESCE(md5(string_agg(
+            concat_ws(E'\\x1f', id, name, name_external_german, data_source), E'\\x1e' ORDER BY id
+        )), '')
+        FROM columns
+    ) || '|' || (
+        SELECT COALESCE(md5(string_agg(
+            concat_ws(':', c.relname, a.attnum, a.attname, a.atttypid, a.atttypmod, a.attisdropped),
+            ',' ORDER BY c.relname, a.attnum
+        )), '')
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public'
+          AND c.relname IN ('project_articles', 'articles', 'article_drafts')
+          AND a.attnum > 0
+    )
+"""
+
+_COLUMNS_SQL = "SELECT name, name_external_german, data_source FROM columns ORDER BY id"
+
+# format_type(typ, NULL) entspricht information_schema.data_type (character varying, integer, numeric, ...),
+# format_type(typ, typmod) ist der exakte Cast-Typ (character varying(50), numeric(10,2), ...)
+_ATTRIBUTES_SQL = """
+    SELECT c.relname, a.attname,
+           format_type(a.atttypid, NULL) AS data_type,
+           format_type(a.atttypid, a.atttypmod) AS column_type
+    FROM pg_attribute a
+    JOIN pg_class c ON c.oid = a.attrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public'
+      AND c.relname IN ('project_articles', 'articles', 'article_drafts')
+      AND a.attnum > 0 AND NOT a.attisdropped
+    ORDER BY c.relname, a.attnum
+"""
+
+
+class ColumnSnapshot:
+    """Unveränderlicher Stand der Registry für eine Version."""
+
+    def __init__(self, version: Optional[str], columns: List[Tuple[Any, ...]], attributes: List[Tuple[Any, ...]]):
+        self.version = version
+        # [(name, name_external_german, data_source)] in columns.id-Reihenfolge
+        self.columns = [tuple(r) for r in columns]
+        # {table: {column: data_type}} / {table: {column: exakter Cast-Typ}}, in Spaltenreihenfolge
+        self.data_types: Dict[str, Dict[str, str]] = {t: {} for t in SOURCE_TABLES}
+        self.column_types: Dict[str, Dict[str, str]] = {t: {} for t in SOURCE_TABLES}
+        for table, column, data_type, column_type in attributes:
+            self.data_types[table][column] = data_type
+            self.column_types[table][column] = column_type
+
+        # Grid-Header (name_external_german) -> interner Name / Herkunftstabelle (für /updateEdits)
+        self.ext_to_int: Dict[str, str] = {}
+        self.ext_to_table: Dict[str, Optional[str]] = {}
+        for name, ext, _ in self.columns:
+            if ext is None:
+                continue
+            self.ext_to_int[ext] = name
+            if name in self.data_types["project_articles"]:
+                self.ext_to_table[ext] = "project_articles"
+            elif name in self.data_types["articles"]:
+                self.ext_to_table[ext] = "articles"
+            else:
+                self.ext_to_table[ext] = None
+
+    def column_origins(self) -> List[Tuple[str, Optional[str], Optional[str], str]]:
+        """[(name, name_external_german, data_source, table)] – je Tabelle (project_articles, articles), in der die Spalte existiert."""
+        rows = []
+        for table in ("project_articles", "articles"):
+            for name, ext, data_source in self.columns:
+                if name in self.data_types[table]:
+                    rows.append((name, ext, data_source, table))
+        return rows
+
+
+class ColumnRegistry:
+    def __init__(self):
+        self._snapshot: Optional[ColumnSnapshot] = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _current(self, version) -> Optional[ColumnSnapshot]:
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None and snapshot.version == version else None
+
+    def _store(self, snapshot: ColumnSnapshot) -> ColumnSnapshot:
+        with self._lock:
+            self._snapshot = snapshot
+            self.loads += 1
+        return snapshot
+
+    async def get(self, conn) -> ColumnSnapshot:
+        """asyncpg: eine Versions-Abfrage, Neuladen nur bei geänderter Version."""
+        version = await conn.fetchval(_VERSION_SQL)
+        snapshot = self._current(version)
+        if snapshot is not None:
+            return snapshot
+        columns = await conn.fetch(_COLUMNS_SQL)
+        attributes = await conn.fetch(_ATTRIBUTES_SQL)
+        return self._store(ColumnSnapshot(version, columns, attributes))
+
+    def get_sync(self, cursor) -> ColumnSnapshot:
+        """psycopg2-Variante für die Materializer (laufen in Threads / als Skript)."""
+        cursor.execute(_VERSION_SQL)
+        version = cursor.fetchone()[0]
+        snapshot = self._current(version)
+        if snapshot is not None:
+            return snapshot
+        cursor.execute(_COLUMNS_SQL)
+        columns = cursor.fetchall()
+        cursor.execute(_ATTRIBUTES_SQL)
+        attributes = cursor.fetchall()
+        return self._store(ColumnSnapshot(version, columns, attributes))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+    def metrics(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {"loads": self.loads, "columns": len(snapshot.columns) if snapshot else 0}
+
+
+column_registry = ColumnRegistry()
@@ -1,32 +1,47 @@
 import os
 import json
-from typing import Dict
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
 
 PREFIXES = ["Ba", "Wa", "Ka", "Zng", "Db", "Ex"]
+MAX_SCAN_WORKERS = 16
 
-def count_doc_meta_for_article(article_id: int, base_path: str) -> Dict[str, int]:
+
+def article_folder_name(article_id: int) -> str:
+    return f"article_id({article_id})"
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {prefix: 0 for prefix in PREFIXES}
+
+
+def scan_article_folder(folder: str) -> Tuple[Dict[str, int], Optional[str]]:
     """
-    Count files and manifest links for each prefix in the article documentation folder.
+    Count files and manifest links for each prefix in one article folder (one os.scandir).
     Only considers the article-level folder (not revision subfolders).
-    Returns a dict: {prefix: count}
+    Returns ({prefix: count}, sha1 of manifest.json or None).
     """
-    folder = os.path.join(base_path, f"article_id({article_id})")
-    counts = {prefix: 0 for prefix in PREFIXES}
-    if not os.path.isdir(folder):
-        return counts
+    counts = _empty_counts()
+    manifest_hash = None
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return counts, None
 
     # Count files
-    for fname in os.listdir(folder):
+    for entry in entries:
         for prefix in PREFIXES:
-            if fname.startswith(f"{prefix}__"):
+            if entry.name.startswith(f"{prefix}__"):
                 counts[prefix] += 1
 
     # Count manifest links
-    manifest_path = os.path.join(folder, "manifest.json")
-    if os.path.isfile(manifest_path):
+    if any(e.name == "manifest.json" and e.is_file() for e in entries):
         try:
-            with open(manifest_path, "r", encoding="utf-8") as f:
-                manifest = json.load(f)
+            with open(os.path.join(folder, "manifest.json"), "rb") as f:
+                raw = f.read()
+            manifest_hash = hashlib.sha1(raw).hexdigest()
+            manifest = json.loads(raw.decode("utf-8"))
             links = manifest.get("links", [])
             for link in links:
                 name = (link.get("name") or "")
@@ -35,24 +50,162 @@ def count_doc_meta_for_article(article_id: int, base_path: str) -> Dict[str, int
                         counts[prefix] += 1
         except Exception:
             pass  # Ignore manifest errors
-    return counts
+    return counts, manifest_hash
 
-def batch_update_doc_meta_for_articles(base_path: str, db_url=None):
+
+def count_doc_meta_for_article(article_id: int, base_path: str) -> Dict[str, int]:
+    """
+    Count files and manifest links for each prefix in the article documentation folder.
+    Returns a dict: {prefix: count}
+    """
+    folder = os.path.join(base_path, article_folder_name(article_id))
+    return scan_article_folder(folder)[0]
+
+
+def _folder_signature(folder: str, entry: Optional[os.DirEntry]) -> Tuple[Optional[float], Optional[float]]:
+    """(folder mtime, manifest mtime). File add/remove bumps the folder, edits only the manifest."""
+    if entry is None:
+        return None, None
+    try:
+        folder_mtime = entry.stat().st_mtime
+    except OSError:
+        return None, None
+    try:
+        manifest_mtime = os.stat(os.path.join(folder, "manifest.json")).st_mtime
+    except OSError:
+        manifest_mtime = None
+    return folder_mtime, manifest_mtime
+
+
+def _ensure_index_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS article_doc_meta_index (
+            article_id     int PRIMARY KEY,
+            folder_mtime   double precision,
+            manifest_mtime double precision,
+            manifest_hash  text,
+            counts         jsonb,
+            scanned_at     timestamptz NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def update_doc_meta_incremental(
+    base_path: str,
+    db_url=None,
+    article_ids: Optional[Iterable[int]] = None,
+    force: bool = False,
+) -> list[int]:
+    """
+    Refreshes the articles doc counters (ba, wa, ka, zng, db, ex) from disk.
+    Only folders whose mtime / manifest mtime changed since the last run are
+    rescanned (in parallel). The resulting counts are compared with the current
+    articles columns and every mismatch is written in one batched UPDATE.
+    article_ids restricts the run to these articles (e.g. from the watcher),
+    force=True rescans regardless of the stored signatures.
+    Returns the ids whose counters changed.
+    """
     import psycopg2
+    from psycopg2.extras import execute_values, Json
+    from backend.utils.materialized import bump_generation, ARTICLES_GENERATION
     if db_url is None:
         from backend.settings.connection_points import DB_URL as db_url
     conn = psycopg2.connect(db_url)
     cur = conn.cursor()
-    cur.execute("SELECT id FROM articles")
-    article_ids = [row[0] for row in cur.fetchall()]
-    for aid in article_ids:
-        counts = count_doc_meta_for_article(aid, base_path)
-        set_clause = ", ".join([f"{prefix.lower()} = %s" for prefix in PREFIXES])
-        values = [str(counts[prefix]) if counts[prefix] > 0 else '' for prefix in PREFIXES]
-        cur.execute(f"UPDATE articles SET {set_clause} WHERE id = %s", values + [aid])
-    conn.commit()
-    cur.close()
-    conn.close()
+    try:
+        _ensure_index_table(cur)
+        value_cols = ", ".join([prefix.lower() for prefix in PREFIXES])
+        if article_ids is None:
+            cur.execute(f"SELECT id, {value_cols} FROM articles")
+        else:
+            cur.execute(f"SELECT id, {value_cols} FROM articles WHERE id = ANY(%s)", (list(article_ids),))
+        # current counters in articles (may have been overwritten by an import / edit since the last scan)
+        stored_values = {row[0]: tuple('' if v is None else str(v) for v in row[1:]) for row in cur.fetchall()}
+        ids = list(stored_values)
+        cur.execute("""
+            SELECT article_id, folder_mtime, manifest_mtime, manifest_hash, counts
+            FROM article_doc_meta_index
+            WHERE article_id = ANY(%s)
+        """, (ids,))
+        index = {row[0]: ((row[1], row[2]), row[3], row[4]) for row in cur.fetchall()}
+
+        # One directory listing of the base path instead of an isdir per article
+        folder_entries: Dict[str, os.DirEntry] = {}
+        try:
+            with os.scandir(base_path) as it:
+                for entry in it:
+                    if entry.name.startswith("article_id(") and entry.is_dir():
+                        folder_entries[entry.name] = entry
+        except OSError:
+            pass
+
+        def probe(aid):
+            name = article_folder_name(aid)
+            folder = os.path.join(base_path, name)
+            signature = _folder_signature(folder, folder_entries.get(name))
+            stored = index.get(aid)
+            if not force and stored is not None:
+                if stored[0] == signature:
+                    return None
+                if stored[0][0] == signature[0] and stored[1] is not None:
+                    # only the manifest was touched: unchanged content -> keep counts
+                    try:
+                        with open(os.path.join(folder, "manifest.json"), "rb") as f:
+                            if hashlib.sha1(f.read()).hexdigest() == stored[1]:
+                                return aid, signature, stored[2], stored[1]
+                    except OSError:
+                        pass
+            if signature[0] is None:
+                return aid, signature, _empty_counts(), None
+            counts, manifest_hash = scan_article_folder(folder)
+            return aid, signature, counts, manifest_hash
+
+        with ThreadPoolExecutor(max_workers=MAX_SCAN_WORKERS) as pool:
+            probed = list(pool.map(probe, ids))
+        results = [r for r in probed if r is not None]
+
+        # Compare against the articles columns, not just the index: unchanged folders
+        # (probe -> None) still get their indexed counts written back if articles drifted.
+        changed = []
+        for aid, result in zip(ids, probed):
+            counts = result[2] if result is not None else index[aid][2]
+            values = tuple(str(counts.get(prefix, 0)) if counts.get(prefix, 0) > 0 else '' for prefix in PREFIXES)
+            if values != stored_values[aid]:
+                changed.append((aid, values))
+        if changed:
+            set_clause = ", ".join([f"{prefix.lower()} = v.{prefix.lower()}" for prefix in PREFIXES])
+            execute_values(cur, f"""
+                UPDATE articles a SET {set_clause}
+                FROM (VALUES %s) AS v(id, {value_cols})
+                WHERE a.id = v.id
+            """, [(aid, *values) for aid, values in changed], page_size=len(changed))
+            # abgeleitete Artikel-Tabellen (Viz) aller Worker veralten mit diesem Commit
+            bump_generation(cur, ARTICLES_GENERATION)
+        if results:
+            execute_values(cur, """
+                INSERT INTO article_doc_meta_index
+                    (article_id, folder_mtime, manifest_mtime, manifest_hash, counts, scanned_at)
+                VALUES %s
+                ON CONFLICT (article_id) DO UPDATE SET
+                    folder_mtime = EXCLUDED.folder_mtime,
+                    manifest_mtime = EXCLUDED.manifest_mtime,
+                    manifest_hash = EXCLUDED.manifest_hash,
+                    counts = EXCLUDED.counts,
+                    scanned_at = EXCLUDED.scanned_at
+            """, [
+                (aid, sig[0], sig[1], manifest_hash, Json(counts))
+                for aid, sig, counts, manifest_hash in results
+            ], template="(%s, %s, %s, %s, %s, now())", page_size=len(results))
+        conn.commit()
+        return [aid for aid, _ in changed]
+    finally:
+        cur.close()
+        conn.close()
+
+
+def batch_update_doc_meta_for_articles(base_path: str, db_url=None):
+    return update_doc_meta_incremental(base_path, db_url=db_url)
+
 
 if __name__ == "__main__":
     import sys
@@ -66,5 +219,6 @@ if __name__ == "__main__":
     with open(os.path.join(os.path.dirname(__file__), '../../config.json'), 'r', encoding='utf-8') as f:
         _config = json.load(f)
     ARTICLE_DOCUMENTATION_PATH = _config.get('ARTICLE_DOCUMENTATION_PATH', '')
-    batch_update_doc_meta_for_articles(ARTICLE_DOCUMENTATION_PATH, db_url=DB_URL)
-    print("Doc meta update complete.")
+    force = "--force" in sys.argv
+    changed = update_doc_meta_incremental(ARTICLE_DOCUMENTATION_PATH, db_url=DB_URL, force=force)
+    print(f"Doc meta update complete ({len(changed)} article(s) changed).")
@@ -0,0 +1,288 @@
+# backend/utils/doc_meta_watcher.py
+"""
+Keeps the article documentation counters (Ba/Wa/Ka/Zng/Db/Ex) live.
+- Linux: inotify (via ctypes) on ARTICLE_DOCUMENTATION_PATH and every article_id(...) folder.
+- Always: periodic incremental scan (only changed folders are rescanned). With inotify this is
+  the safety net for changes inotify never reports (SMB/NFS shares, lost watches, overflow).
+Changes are debounced per article folder, written in batches via
+update_doc_meta_incremental and announced as SSE event "doc_meta_changed".
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import os
+import re
+import struct
+import sys
+from typing import Optional
+
+from backend.SSE.event_bus import publish_all
+from backend.settings.connection_points import (
+    ARTICLE_DOCUMENTATION_PATH,
+    DEBUG,
+    DOC_META_WATCHER,
+    DOC_META_POLL_INTERVAL,
+)
+from backend.utils.doc_meta_counter import update_doc_meta_incremental
+
+_FOLDER_RE = re.compile(r"^article_id\((-?\d+)\)$")
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_BASE_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+_FOLDER_MASK = (
+    IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE
+    | IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _article_id_from_folder(name: str) -> Optional[int]:
+    m = _FOLDER_RE.match(name)
+    return int(m.group(1)) if m else None
+
+
+class _Inotify:
+    """Thin ctypes wrapper around inotify_init1 / inotify_add_watch / inotify_rm_watch."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm = libc.inotify_rm_watch
+        self._rm.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str, mask: int) -> int:
+        wd = self._add(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        self._rm(self.fd, wd)
+
+    def read_events(self):
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset:offset + length].rstrip(b"\0").decode("utf-8", "replace")
+            offset += length
+            yield wd, mask, name
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class DocMetaWatcher:
+    def __init__(self, base_path: str, mode: str = "auto",
+                 poll_interval: float = 30.0, debounce: float = 1.0, batch_delay: float = 0.25):
+        self.base_path = base_path
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.batch_delay = batch_delay
+        self._task: Optional[asyncio.Task] = None
+        self._inotify: Optional[_Inotify] = None
+        self._base_wd: Optional[int] = None
+        self._wd_to_article: dict[int, int] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self._ready: set[int] = set()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._full_resync = False
+        self._lock = asyncio.Lock()
+        self._listeners: list = []
+        self._live = False  # initialer Sync durch + Überwachung läuft
+
+    # --- lifecycle ---------------------------------------------------------
+
+    def add_listener(self, callback) -> None:
+        """callback(changed_article_ids) nach jedem Sync mit Änderungen."""
+        self._listeners.append(callback)
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def is_live(self) -> bool:
+        """True erst nach einem erfolgreichen Sync, solange die Überwachung läuft (Zähler aktuell)."""
+        return self._live and self.is_running()
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+        if self.mode == "off" or not self.base_path or not os.path.isdir(self.base_path):
+            if DEBUG:
+                print(f"[DEBUG] doc meta watcher disabled (mode={self.mode}, path={self.base_path!r})")
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._live = False
+
+    async def _run(self) -> None:
+        # Änderungen während der Downtime nachziehen (inkrementell, nur geänderte Ordner)
+        synced = await self._sync(None)
+        use_inotify = self.mode == "inotify" or (self.mode == "auto" and sys.platform.startswith("linux"))
+        if use_inotify:
+            try:
+                self._start_inotify()
+            except OSError as e:
+                print(f"⚠️ inotify unavailable ({e}), falling back to polling")
+                use_inotify = False
+        try:
+            self._live = synced
+            # Poll läuft auch neben inotify weiter: Netzlaufwerke melden keine Events
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                synced = await self._sync(None)
+                self._live = self._live or synced
+        finally:
+            self._live = False
+            self._stop_inotify()
+
+    # --- inotify -----------------------------------------------------------
+
+    def _start_inotify(self) -> None:
+        self._inotify = _Inotify()
+        self._base_wd = self._inotify.add_watch(self.base_path, _BASE_MASK)
+        with os.scandir(self.base_path) as it:
+            for entry in it:
+                aid = _article_id_from_folder(entry.name)
+                if aid is not None and entry.is_dir():
+                    self._watch_folder(aid, entry.path)
+        asyncio.get_running_loop().add_reader(self._inotify.fd, self._on_readable)
+        if DEBUG:
+            print(f"[DEBUG] doc meta watcher: inotify on {len(self._wd_to_article)} folder(s)")
+
+    def _stop_inotify(self) -> None:
+        if self._inotify is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._inotify.fd)
+        except RuntimeError:
+            pass
+        self._inotify.close()
+        self._inotify = None
+        self._wd_to_article.clear()
+        for handle in self._timers.values():
+            handle.cancel()
+        self._timers.clear()
+
+    def _watch_folder(self, aid: int, path: str) -> None:
+        try:
+            wd = self._inotify.add_watch(path, _FOLDER_MASK)
+        except OSError as e:
+            print(f"⚠️ cannot watch {path}: {e}")
+            return
+        self._wd_to_article[wd] = aid
+
+    def _on_readable(self) -> None:
+        for wd, mask, name in self._inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                self._full_resync = True
+                self._schedule_flush()
+                continue
+            if mask & IN_IGNORED:
+                self._wd_to_article.pop(wd, None)
+                continue
+            if wd == self._base_wd:
+                aid = _article_id_from_folder(name)
+                if aid is None:
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO) and mask & IN_ISDIR:
+                    self._watch_folder(aid, os.path.join(self.base_path, name))
+                self._mark_dirty(aid)
+            else:
+                aid = self._wd_to_article.get(wd)
+                if aid is not None:
+                    self._mark_dirty(aid)
+
+    # --- debounce + batch flush --------------------------------------------
+
+    def _mark_dirty(self, aid: int) -> None:
+        """Debounce pro article_id(...)-Ordner: erst nach `debounce` s Ruhe wird er fällig."""
+        loop = asyncio.get_running_loop()
+        handle = self._timers.pop(aid, None)
+        if handle:
+            handle.cancel()
+        self._timers[aid] = loop.call_later(self.debounce, self._folder_settled, aid)
+
+    def _folder_settled(self, aid: int) -> None:
+        self._timers.pop(aid, None)
+        self._ready.add(aid)
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(
+                self.batch_delay, lambda: asyncio.create_task(self._flush())
+            )
+
+    async def _flush(self) -> None:
+        self._flush_handle = None
+        if self._full_resync:
+            self._full_resync = False
+            self._ready.clear()
+            await self._sync(None)
+            return
+        ids, self._ready = sorted(self._ready), set()
+        if ids:
+            await self._sync(ids)
+
+    async def _sync(self, article_ids) -> bool:
+        async with self._lock:
+            try:
+                changed = await asyncio.to_thread(
+                    update_doc_meta_incremental, self.base_path, None, article_ids
+                )
+            except Exception as e:
+                print(f"[ERROR] doc meta sync failed: {e}")
+                return False
+        if changed:
+            if DEBUG:
+                print(f"[DEBUG] doc meta changed for {len(changed)} article(s)")
+            for callback in self._listeners:
+                try:
+                    callback(changed)
+                except Exception as e:
+                    print(f"[ERROR] doc meta listener failed: {e}")
+            publish_all({"type": "doc_meta_changed", "article_ids": changed})
+        return True
+
+
+doc_meta_watcher = DocMetaWatcher(
+    ARTICLE_DOCUMENTATION_PATH,
+    mode=DOC_META_WATCHER,
+    poll_interval=DOC_META_POLL_INTERVAL,
+)
@@ -0,0 +1,329 @@
+# backend/utils/edit_buffer.py
+"""
+Write-behind-Puffer für Zell-Edits (POST /api/bufferEdits).
+- Edits werden von Postgres gegen die Spaltentypen geprüft (edit_cast_error, gleicher Cast wie beim
+  Flush; falscher Typ / zu lang -> 400, nichts wird journalisiert),
+  dann sofort in edit_journal geschrieben (ein Statement) und mit einer Sequenznummer quittiert;
+  alle Zellen eines Requests bekommen dieselbe seq. Pro Zelle (project_id, sheet, row_id, col_name)
+  gibt es nur eine Journal-Zeile: wiederholte Writes auf dieselbe Zelle überschreiben Wert + seq
+  (ON CONFLICT) -> zusammengefasst.
+- Pro (project_id, sheet) wird nach EDIT_BUFFER_FLUSH_INTERVAL s bzw. ab EDIT_BUFFER_MAX_EDITS
+  offenen Zellen geflusht: in einer Transaktion DELETE ... RETURNING aus dem Journal,
+  set-basiert anwenden (utils/edit_writer.py), commit; danach ein Remat-Trigger pro Flush.
+  Scheitert das Anwenden an Daten (DATA_ERRORS), werden die schuldigen Zellen per Savepoint +
+  Halbierung isoliert und nur diese verworfen ("edits_rejected"); alle anderen Fehler
+  (Verbindung, Schema) rollen zurück und werden mit Backoff wiederholt – verworfen wird dann nichts.
+- Quittiert = committet im Journal -> übersteht Worker-Neustarts; beim Start werden offene
+  Journal-Einträge nachgeflusht. Mehrere Worker serialisieren den Flush pro Sheet über
+  pg_advisory_xact_lock.
+- /updateEdits schreibt direkt: vorher werden gepufferte Edits auf denselben Zellen geflusht
+  (flush_cells), ein älterer Journal-Wert überschreibt den direkten Write also nie.
+- seq ist kein Wasserzeichen (parallele Requests committen nicht in seq-Reihenfolge): das SSE-Event
+  "edits_flushed" listet die angewendeten Zellen mit ihrer seq. Eine Zelle ist in der DB, sobald sie
+  dort mit der seq ihrer Quittung (oder einer höheren, späterer Write) auftaucht.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.SSE.event_bus import publish
+from backend.loading.rematerialize_control import (
+    schedule_sheet_and_elektrik_rematerialize,
+    schedule_all_rematerialize,
+)
+from backend.settings.connection_points import DEBUG, EDIT_BUFFER_FLUSH_INTERVAL, EDIT_BUFFER_MAX_EDITS
+from backend.settings.db_pool import db_connection
+from backend.utils.column_registry import column_registry
+from backend.utils.edit_writer import (
+    DATA_ERRORS,
+    EDIT_CAST_ERROR_FUNCTION_SQL,
+    InvalidEdits,
+    apply_grouped_edits,
+    group_edits,
+    validate_edits,
+)
+
+MAX_BACKOFF_EXPONENT = 6
+
+Key = Tuple[int, str]
+
+
+def trigger_rematerialize(project_id: int, sheet_name: Optional[str]) -> None:
+    # 🔔 Remat-Trigger nach den DB-Writes (gleiche Regeln wie /updateEdits)
+    if sheet_name and str(sheet_name).startswith("materialized_elektrik_"):
+        schedule_all_rematerialize(project_id)
+    elif sheet_name:
+        schedule_sheet_and_elektrik_rematerialize(project_id, sheet_name)
+
+
+class EditBuffer:
+    def __init__(self, flush_interval: float = 0.3, max_edits: int = 500):
+        self.flush_interval = flush_interval
+        self.max_edits = max_edits
+        self._ready = False
+        self._ddl_lock = asyncio.Lock()
+        self._pending: Dict[Key, int] = {}  # offene Zellen seit dem letzten Flush (Schätzung, nur Schwelle)
+        self._timers: Dict[Key, asyncio.TimerHandle] = {}
+        self._locks: Dict[Key, asyncio.Lock] = {}
+        self._lock_users: Dict[Key, int] = {}  # flush() aktiv oder wartend; bei 0 fliegt der Lock raus
+        self._failures: Dict[Key, int] = {}
+        self._tasks: set = set()
+        self.metrics_counters = {
+            "accepted": 0, "flushes": 0, "flushed_cells": 0, "rejected_cells": 0, "failed_flushes": 0,
+        }
+
+    # --- lifecycle ---------------------------------------------------------
+
+    async def _ensure_journal(self, conn) -> None:
+        if self._ready:
+            return
+        async with self._ddl_lock:
+            if self._ready:
+                return
+            # mehrere Worker starten gleichzeitig: CREATE OR REPLACE FUNCTION ist nicht nebenläufig sicher
+            await conn.execute("""
+                SELECT pg_advisory_xact_lock(hashtext('edit_journal_ddl'));
+                CREATE SEQUENCE IF NOT EXISTS edit_journal_seq;
+                CREATE TABLE IF NOT EXISTS edit_journal (
+                    project_id  int NOT NULL,
+                    sheet       text NOT NULL,
+                    row_id      int NOT NULL,
+                    col_name    text NOT NULL,
+                    new_value   jsonb,
+                    seq         bigint NOT NULL DEFAULT nextval('edit_journal_seq'),
+                    received_at timestamptz NOT NULL DEFAULT now(),
+                    PRIMARY KEY (project_id, sheet, row_id, col_name)
+                );
+            """ + EDIT_CAST_ERROR_FUNCTION_SQL)
+            self._ready = True
+
+    async def start(self) -> None:
+        """Beim Start: noch nicht geflushte (aber quittierte) Edits aus dem Journal anwenden."""
+        try:
+            async with db_connection() as conn:
+                await self._ensure_journal(conn)
+                keys = await conn.fetch("SELECT DISTINCT project_id, sheet FROM edit_journal")
+        except Exception as e:
+            print(f"[ERROR] edit buffer recovery failed: {e}")
+            return
+        if keys and DEBUG:
+            print(f"[DEBUG] edit buffer: {len(keys)} sheet(s) with journaled edits -> flush")
+        for r in keys:
+            self._schedule((r["project_id"], r["sheet"]), 0)
+
+    async def stop(self) -> None:
+        """Offene Sheets sofort flushen (was nicht klappt, bleibt im Journal für den nächsten Start)."""
+        for handle in self._timers.values():
+            handle.cancel()
+        keys = list(self._timers)
+        self._timers.clear()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for key in keys:
+            await self.flush(key)
+
+    # --- accept ------------------------------------------------------------
+
+    async def accept(self, project_id: int, sheet: str, edits: List[Dict[str, Any]]) -> int:
+        """
+        Edits ins Journal (committet) -> seq als Quittung (gleich für alle Zellen des Requests).
+        InvalidEdits (ValueError) bei Werten, die nicht zum Spaltentyp passen, ValueError bei kaputten Edits.
+        """
+        cells: Dict[Tuple[int, str], Any] = {}
+        for edit in edits:
+            try:
+                cells[(int(edit["rowId"]), str(edit["colName"]))] = edit.get("newValue")
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"invalid edit: {edit!r}")
+        if not cells:
+            return 0
+        # ON CONFLICT darf dieselbe Zelle nicht zweimal im Statement treffen -> vorher zusammenfassen
+        row_ids = [row_id for row_id, _ in cells]
+        col_names = [col for _, col in cells]
+        values = [json.dumps(v, ensure_ascii=False) for v in cells.values()]
+        async with db_connection() as conn:
+            await self._ensure_journal(conn)
+            # Typfehler hier abweisen statt später beim Flush (nach der Quittung) verwerfen
+            columns = await column_registry.get(conn)
+            invalid = await validate_edits(
+                conn,
+                [{"rowId": row_id, "colName": col, "newValue": v} for (row_id, col), v in cells.items()],
+                columns,
+            )
+            if invalid:
+                raise InvalidEdits(invalid)
+            seq = await conn.fetchval("""
+                WITH s AS (SELECT nextval('edit_journal_seq') AS seq),
+                written AS (
+                    INSERT INTO edit_journal (project_id, sheet, row_id, col_name, new_value, seq)
+                    SELECT $1, $2, e.row_id, e.col_name, e.new_value::jsonb, s.seq
+                    FROM unnest($3::int[], $4::text[], $5::text[]) AS e(row_id, col_name, new_value), s
+                    ON CONFLICT (project_id, sheet, row_id, col_name) DO UPDATE
+                        SET new_value = EXCLUDED.new_value,
+                            seq = EXCLUDED.seq,
+                            received_at = now()
+                    RETURNING seq
+                )
+                SELECT max(seq) FROM written
+            """, project_id, sheet, row_ids, col_names, values)
+
+        key = (project_id, sheet)
+        self.metrics_counters["accepted"] += len(cells)
+        self._pending[key] = self._pending.get(key, 0) + len(cells)
+        self._schedule(key, 0 if self._pending[key] >= self.max_edits else self.flush_interval)
+        return seq
+
+    # --- flush -------------------------------------------------------------
+
+    def _schedule(self, key: Key, delay: float) -> None:
+        handle = self._timers.get(key)
+        if handle is not None:
+            if delay > 0:
+                return  # Flush steht schon an – Intervall nicht verlängern (Latenz bleibt begrenzt)
+            handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._timers[key] = loop.call_later(delay, self._spawn_flush, key)
+
+    def _spawn_flush(self, key: Key) -> None:
+        self._timers.pop(key, None)
+        task = asyncio.create_task(self.flush(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self, key: Key) -> int:
+        """Alle Journal-Einträge eines Sheets anwenden; Rückgabe = Anzahl angewendeter Zellen."""
+        project_id, sheet = key
+        # Lock pro Sheet nur, solange jemand flusht oder wartet -> kein Wachstum über alle Sheets
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                result = await self._flush_journal(key)
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                self._locks.pop(key, None)
+        if result is None:
+            return 0
+        applied, rejected = result
+        if applied:
+            trigger_rematerialize(project_id, sheet)
+            publish(project_id, {"type": "edits_flushed", "sheet": sheet, "count": len(applied),
+                                 "cells": [_cell(r) for r in applied]})
+        if rejected:
+            print(f"⚠️ edit buffer: {len(rejected)} Edit(s) für {sheet} verworfen")
+            publish(project_id, {"type": "edits_rejected", "sheet": sheet,
+                                 "cells": [{**_cell(r), "error": error} for r, error in rejected]})
+        return len(applied)
+
+    async def _flush_journal(self, key: Key) -> Optional[Tuple[list, list]]:
+        """Eine Flush-Transaktion -> (angewendet, verworfen); None = nichts offen bzw. fehlgeschlagen."""
+        project_id, sheet = key
+        self._pending.pop(key, None)
+        try:
+            async with db_connection() as conn:
+                async with conn.transaction():
+                    await conn.execute(
+                        "SELECT pg_advisory_xact_lock(hashtext($1))", f"edit_journal:{project_id}:{sheet}"
+                    )
+                    rows = await conn.fetch("""
+                        DELETE FROM edit_journal WHERE project_id = $1 AND sheet = $2
+                        RETURNING row_id, col_name, new_value, seq
+                    """, project_id, sheet)
+                    if not rows:
+                        self._failures.pop(key, None)  # z. B. von einem anderen Worker geflusht
+                        return None
+                    rows = sorted(rows, key=lambda r: r["seq"])
+                    columns = await column_registry.get(conn)
+                    applied, rejected = await self._apply_isolated(conn, rows, columns)
+        except Exception as e:
+            self._flush_failed(key, e)
+            return None
+
+        self._failures.pop(key, None)
+        self.metrics_counters["flushes"] += 1
+        self.metrics_counters["flushed_cells"] += len(applied)
+        self.metrics_counters["rejected_cells"] += len(rejected)
+        if DEBUG:
+            print(f"[DEBUG] edit buffer flush {sheet} (project {project_id}): "
+                  f"{len(applied)} Zelle(n) angewendet, {len(rejected)} verworfen")
+        return applied, rejected
+
+    async def flush_cells(self, project_id: int, edits: List[Dict[str, Any]]) -> bool:
+        """
+        Vor einem direkten Write (/updateEdits): gepufferte Edits auf denselben Zellen zuerst anwenden,
+        damit ein älterer Journal-Wert den neueren direkten Wert nicht später überschreibt.
+        False = für diese Zellen ist noch etwas im Journal (Flush fehlgeschlagen) -> nicht direkt schreiben.
+        """
+        row_ids, col_names = [], []
+        for edit in edits:
+            try:
+                row_ids.append(int(edit["rowId"]))
+                col_names.append(str(edit["colName"]))
+            except (KeyError, TypeError, ValueError):
+                continue  # kaputte Edits lehnt der Aufrufer ab
+        if not row_ids:
+            return True
+        sql = """
+            SELECT DISTINCT j.sheet FROM edit_journal j
+            JOIN unnest($2::int[], $3::text[]) AS c(row_id, col_name)
+              ON c.row_id = j.row_id AND c.col_name = j.col_name
+            WHERE j.project_id = $1
+        """
+        async with db_connection() as conn:
+            await self._ensure_journal(conn)
+            sheets = [r["sheet"] for r in await conn.fetch(sql, project_id, row_ids, col_names)]
+        if not sheets:
+            return True
+        for sheet in sheets:
+            await self.flush((project_id, sheet))
+        async with db_connection() as conn:
+            return not await conn.fetch(sql, project_id, row_ids, col_names)
+
+    async def _apply_isolated(self, conn, rows, columns) -> Tuple[list, list]:
+        """
+        rows in einem Savepoint anwenden. Scheitert das an den Daten (DATA_ERRORS), wird halbiert,
+        bis die schuldigen Zellen einzeln feststehen -> (angewendet, [(row, Fehler)]).
+        Andere Fehler gehen nach oben: ganze Transaktion zurück, Journal bleibt unverändert.
+        """
+        try:
+            async with conn.transaction():
+                edits = [
+                    {"rowId": r["row_id"], "colName": r["col_name"],
+                     "newValue": json.loads(r["new_value"]) if r["new_value"] is not None else None}
+                    for r in rows
+                ]
+                edits_by_row_pa, edits_by_row_ad = group_edits(edits, columns.ext_to_int, columns.ext_to_table)
+                await apply_grouped_edits(conn, edits_by_row_pa, edits_by_row_ad, columns.data_types)
+            return list(rows), []
+        except DATA_ERRORS as e:
+            if len(rows) == 1:
+                return [], [(rows[0], str(e))]
+            mid = len(rows) // 2
+            applied_a, rejected_a = await self._apply_isolated(conn, rows[:mid], columns)
+            applied_b, rejected_b = await self._apply_isolated(conn, rows[mid:], columns)
+            return applied_a + applied_b, rejected_a + rejected_b
+
+    def _flush_failed(self, key: Key, error: Exception) -> None:
+        """
+        Transaktion ist zurückgerollt -> Edits bleiben im Journal; Retry mit Backoff.
+        Hier landen nur Fehler, die nicht an einzelnen Werten liegen (DB weg, Schema) -> nie verwerfen.
+        """
+        project_id, sheet = key
+        attempts = self._failures.get(key, 0) + 1
+        self._failures[key] = attempts
+        self.metrics_counters["failed_flushes"] += 1
+        print(f"[ERROR] edit buffer flush {sheet} (project {project_id}) failed (attempt {attempts}): {error}")
+        self._schedule(key, self.flush_interval * (2 ** min(attempts, MAX_BACKOFF_EXPONENT)))
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.metrics_counters, "pending_sheets": len(self._timers)}
+
+
+def _cell(row) -> Dict[str, Any]:
+    return {"rowId": row["row_id"], "colName": row["col_name"], "seq": row["seq"]}
+
+
+edit_buffer = EditBuffer(EDIT_BUFFER_FLUSH_INTERVAL, EDIT_BUFFER_MAX_EDITS)
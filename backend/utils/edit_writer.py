@@ -0,0 +1,262 @@
+# backend/utils/edit_writer.py
+"""
+Set-basierter Schreibpfad für /updateEdits.
+Edits werden pro Zieltabelle (project_articles / article_drafts) und Spaltenmenge gruppiert;
+jede Gruppe ist genau ein Statement über unnest(...) – ein Paste von 2000 Zellen in einem
+Block = eine Rundreise pro Tabelle statt einer pro Zeile. Alles läuft in einer Transaktion.
+Werte gehen als text[] rein und werden in SQL auf den Basistyp der Spalte gecastet
+(Typen aus der Spalten-Registry, siehe utils/column_registry.py).
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from backend.settings.connection_points import DEBUG
+
+INT_FIELDS = {"project_article_id", "position", "article_id"}
+
+RowEdits = Dict[int, Dict[str, Any]]
+
+# Fehler, die an den Werten einzelner Zellen liegen (nicht an Verbindung/Schema)
+DATA_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError, ValueError, TypeError)
+
+# ON CONFLICT (project_article_id) braucht einen gültigen Unique-Index genau auf dieser Spalte
+_DRAFTS_UNIQUE_INDEX_SQL = """
+    SELECT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = to_regclass('article_drafts')
+          AND i.indisunique AND i.indisvalid
+          AND i.indnatts = 1 AND i.indpred IS NULL AND i.indexprs IS NULL
+          AND a.attname = 'project_article_id'
+    )
+"""
+
+
+def group_edits(
+    edits: List[Dict[str, Any]],
+    ext_to_int: Dict[str, str],
+    ext_to_table: Dict[str, Optional[str]],
+) -> Tuple[RowEdits, RowEdits]:
+    """Grid-Edits -> ({pa_id: {col: val}} für project_articles, {pa_id: {col: val}} für article_drafts)."""
+    edits_by_row_pa: RowEdits = defaultdict(dict)
+    edits_by_row_ad: RowEdits = defaultdict(dict)
+    for edit in edits:
+        row_id = int(edit["rowId"])
+        col = edit["colName"]
+        val = edit["newValue"]
+        mapped_col = ext_to_int.get(col, col)
+        table_origin = ext_to_table.get(col, None)
+        if mapped_col in INT_FIELDS:
+            val = None if val == '' or val is None else int(val)
+        if table_origin == "project_articles":
+            edits_by_row_pa[row_id][mapped_col] = val
+        elif table_origin == "articles":
+            # Artikel-Spalten landen als Entwurf in article_drafts
+            edits_by_row_ad[row_id][mapped_col] = val
+    return dict(edits_by_row_pa), dict(edits_by_row_ad)
+
+
+class InvalidEdits(ValueError):
+    """Edits, deren Werte nicht zum Spaltentyp passen; cells = [{"rowId", "colName", "error"}]."""
+
+    def __init__(self, cells: List[Dict[str, Any]]):
+        super().__init__(f"{len(cells)} invalid edit(s)")
+        self.cells = cells
+
+
+# Zellprüfung vor der Quittung: derselbe Cast, den Postgres beim Flush macht – keine Python-Nachbauten.
+# Gecastet wird auf den exakten Typ (numeric(p,s) wirft bei Überlauf); zeichenbasierte Typen schneidet
+# ein expliziter Cast still ab, die Zuweisung an die Spalte (Flush) wirft dagegen -> Länge wie Postgres
+# prüfen (überzählige Zeichen nur Leerzeichen = ok). Typnamen kommen aus der Registry (format_type).
+EDIT_CAST_ERROR_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION edit_cast_error(val text, typ text) RETURNS text
+    LANGUAGE plpgsql STABLE AS $fn$
+    DECLARE
+        max_len int := substring(typ FROM '^(?:character varying|character)\\((\\d+)\\)$')::int;
+    BEGIN
+        EXECUTE format('SELECT $1::%s', typ) USING val;
+        IF max_len IS NOT NULL AND length(rtrim(val, ' ')) > max_len THEN
+            RETURN format('value too long for type %s', typ);
+        END IF;
+        RETURN NULL;
+    EXCEPTION WHEN data_exception THEN
+        RETURN SQLERRM;
+    END
+    $fn$;
+"""
+
+
+def cast_checks(edits: List[Dict[str, Any]], snapshot) -> Tuple[List[Tuple[Dict[str, Any], str, str]], List[Dict[str, Any]]]:
+    """
+    Grid-Edits -> ([(edit, Cast-Typ, Wert als Text)], fehlerhafte Zellen). Der Text ist genau der,
+    den apply_grouped_edits schreibt (INT_FIELDS wie in group_edits über int()); NULL braucht keinen Cast.
+    """
+    pa_types = snapshot.column_types.get("project_articles", {})
+    ad_types = snapshot.column_types.get("article_drafts", {})
+    checks, invalid = [], []
+    for edit in edits:
+        col = edit["colName"]
+        val = edit["newValue"]
+        mapped_col = snapshot.ext_to_int.get(col, col)
+        table_origin = snapshot.ext_to_table.get(col, None)
+        if table_origin == "project_articles":
+            cast_type = pa_types.get(mapped_col, "text")
+        elif table_origin == "articles":
+            cast_type = ad_types.get(mapped_col, "text")
+        else:
+            continue  # wird von group_edits ohnehin ignoriert
+        if mapped_col in INT_FIELDS:
+            if val == '' or val is None:
+                continue  # group_edits: '' -> NULL
+            try:
+                val = int(val)
+            except (TypeError, ValueError):
+                invalid.append({"rowId": edit["rowId"], "colName": col,
+                                "error": f"invalid input syntax for type {cast_type}: {val!r}"})
+                continue
+        text = _as_text(val)
+        if text is not None:
+            checks.append((edit, cast_type, text))
+    return checks, invalid
+
+
+async def validate_edits(conn: asyncpg.Connection, edits: List[Dict[str, Any]], snapshot) -> List[Dict[str, Any]]:
+    """
+    Grid-Edits gegen die Spaltentypen prüfen (ColumnSnapshot) -> fehlerhafte Zellen.
+    Postgres castet jedes verschiedene (Typ, Wert)-Paar einmal, alles in einer Rundreise
+    (edit_cast_error, angelegt mit dem Journal in utils/edit_buffer.py).
+    """
+    checks, invalid = cast_checks(edits, snapshot)
+    pairs = list(dict.fromkeys((cast_type, text) for _, cast_type, text in checks if cast_type != "text"))
+    if pairs:
+        rows = await conn.fetch("""
+            SELECT v.typ, v.val, edit_cast_error(v.val, v.typ) AS error
+            FROM unnest($1::text[], $2::text[]) AS v(typ, val)
+        """, [t for t, _ in pairs], [v for _, v in pairs])
+        errors = {(r["typ"], r["val"]): r["error"] for r in rows if r["error"]}
+        for edit, cast_type, text in checks:
+            error = errors.get((cast_type, text))
+            if error:
+                invalid.append({"rowId": edit["rowId"], "colName": edit["colName"], "error": error})
+    return invalid
+
+
+def _by_column_set(rows: RowEdits) -> Dict[Tuple[str, ...], List[Tuple[int, Dict[str, Any]]]]:
+    groups = defaultdict(list)
+    for row_id, updates in rows.items():
+        groups[tuple(sorted(updates))].append((row_id, updates))
+    return groups
+
+
+def _as_text(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _unnest(columns: Tuple[str, ...], key: str) -> str:
+    args = ", ".join(f"${i + 1}::text[]" for i in range(len(columns) + 1))
+    names = ", ".join(f'"{c}"' for c in (key, *columns))
+    return f"unnest({args}) AS v({names})"
+
+
+def _arrays(columns: Tuple[str, ...], group: List[Tuple[int, Dict[str, Any]]]) -> List[List[Optional[str]]]:
+    arrays = [[str(row_id) for row_id, _ in group]]
+    for col in columns:
+        arrays.append([_as_text(updates[col]) for _, updates in group])
+    return arrays
+
+
+async def ensure_drafts_unique_index(conn: asyncpg.Connection) -> bool:
+    """
+    Einmalig beim Start (main.startup): Unique-Index für den Upsert anlegen.
+    Duplikate, fehlende Rechte oder ein parallel startender Worker sind kein Fehler –
+    dann bleibt es (bis der Index da ist) beim UPDATE+INSERT-Fallback.
+    """
+    try:
+        async with conn.transaction():
+            await conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS article_drafts_project_article_id_uidx "
+                "ON article_drafts (project_article_id)"
+            )
+    except (asyncpg.UniqueViolationError, asyncpg.DuplicateTableError) as e:
+        # Duplikate in article_drafts – oder der Index wurde gerade von einem anderen Worker angelegt
+        print(f"⚠️ article_drafts unique index not created: {e}")
+    except asyncpg.InsufficientPrivilegeError as e:
+        print(f"⚠️ article_drafts unique index not created (no privilege): {e}")
+    return await _has_drafts_unique_index(conn)
+
+
+async def _has_drafts_unique_index(conn: asyncpg.Connection) -> bool:
+    """Katalog statt Prozess-Flag: Index kann nachträglich (Migration, anderer Worker) entstehen oder wegfallen."""
+    return bool(await conn.fetchval(_DRAFTS_UNIQUE_INDEX_SQL))
+
+
+async def apply_grouped_edits(
+    conn: asyncpg.Connection,
+    edits_by_row_pa: RowEdits,
+    edits_by_row_ad: RowEdits,
+    data_types: Dict[str, Dict[str, str]],
+) -> int:
+    """
+    Schreibt beide Gruppen in einer Transaktion; Rückgabe = Anzahl betroffener Zeilen (wie bisher).
+    data_types: {table: {column: Basistyp}} (ColumnSnapshot.data_types) – bewusst ohne typmod:
+    ein Cast auf character varying(n) würde zu lange Werte stillschweigend abschneiden, die
+    Zuweisung an die Spalte wirft dagegen "value too long".
+    """
+    pa_types = data_types.get("project_articles", {})
+    ad_types = data_types.get("article_drafts", {})
+    async with conn.transaction():
+        upsert = await _has_drafts_unique_index(conn) if edits_by_row_ad else True
+
+        # --- project_articles: UPDATE ... FROM unnest ---
+        for columns, group in _by_column_set(edits_by_row_pa).items():
+            set_clause = ", ".join(f'"{c}" = v."{c}"::{pa_types.get(c, "text")}' for c in columns)
+            sql = f"""
+                UPDATE project_articles t
+                SET {set_clause}
+                FROM {_unnest(columns, "__id")}
+                WHERE t.id = v."__id"::{pa_types.get("id", "int")}
+            """
+            if DEBUG:
+                print(f"✏️ UPDATE project_articles: {len(group)} Zeile(n), Spalten {list(columns)}")
+            await conn.execute(sql, *_arrays(columns, group))
+
+        # --- article_drafts: Upsert pro Spaltenmenge ---
+        for columns, group in _by_column_set(edits_by_row_ad).items():
+            columns = tuple(c for c in columns if c != "project_article_id")
+            key_cast = ad_types.get("project_article_id", "int")
+            insert_cols = ", ".join(f'"{c}"' for c in ("project_article_id", *columns))
+            select_cols = ", ".join(
+                [f'v."__id"::{key_cast}'] + [f'v."{c}"::{ad_types.get(c, "text")}' for c in columns]
+            )
+            if upsert:
+                conflict = (
+                    "DO UPDATE SET " + ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in columns)
+                    if columns else "DO NOTHING"
+                )
+                sql = f"""
+                    INSERT INTO article_drafts ({insert_cols})
+                    SELECT {select_cols} FROM {_unnest(columns, "__id")}
+                    ON CONFLICT (project_article_id) {conflict}
+                """
+            else:
+                set_clause = ", ".join(f'"{c}" = v."{c}"::{ad_types.get(c, "text")}' for c in columns)
+                sql = f"""
+                    WITH v AS (SELECT * FROM {_unnest(columns, "__id")}),
+                    upd AS (
+                        UPDATE article_drafts t SET {set_clause or '"project_article_id" = t."project_article_id"'}
+                        FROM v WHERE t.project_article_id = v."__id"::{key_cast}
+                        RETURNING t.project_article_id
+                    )
+                    INSERT INTO article_drafts ({insert_cols})
+                    SELECT {select_cols} FROM v
+                    WHERE v."__id"::{key_cast} NOT IN (SELECT project_article_id FROM upd)
+                """
+            if DEBUG:
+                print(f"✏️ UPSERT article_drafts: {len(group)} Zeile(n), Spalten {list(columns)}")
+            await conn.execute(sql, *_arrays(columns, group))
+
+    return len(edits_by_row_pa) + len(edits_by_row_ad)
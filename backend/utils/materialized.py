@@ -1,4 +1,4 @@
-import re, sqlalchemy
+import re, sqlalchemy, threading
 from sqlalchemy.engine import Connection
 
 def get_suffix(conn: Connection, project_id: int) -> str:
@@ -15,3 +15,184 @@ def mat_name(view_name: str, suffix: str) -> str:
 
 def assert_belongs(table: str, suffix: str) -> bool:
     return isinstance(table, str) and table.startswith("materialized_") and table.endswith(f"_{suffix}")
+
+
+# Sheet-Reihenfolge: order_key, Tie-Breaker project_article_id (Header-Zeilen: NULL -> 0).
+# Keyset-Fenster (/api/tabledata) vergleichen genau dieses Tupel -> Index-Range-Scan.
+# Layouts ohne project_article_id-Spalte (z. B. manche Elektrik-Layouts): nur order_key.
+ORDER_TIEBREAK_SQL = 'COALESCE("project_article_id", 0)'
+
+def order_tiebreak_sql(columns) -> str:
+    return ORDER_TIEBREAK_SQL if "project_article_id" in columns else "0"
+
+def order_key_index_sql(table: str, columns) -> str:
+    tiebreak = f", {ORDER_TIEBREAK_SQL}" if "project_article_id" in columns else ""
+    return (
+        f'CREATE INDEX IF NOT EXISTS "{table}_order_key_idx" '
+        f'ON "{table}" ("order_key"{tiebreak});'
+    )
+
+
+# Häufig gefilterte Spalten (Layout-Namen). /api/tabledata filtert Text über lower("col"::text)
+# -> gleicher Ausdruck im Index; text_pattern_ops deckt auch startswith (LIKE 'x%') ab.
+FILTER_INDEX_LAYOUT_COLUMNS = ("emsr_no", "einbauort")
+
+def filter_index_sqls(table: str, layout_name_map: dict, output_cols) -> list:
+    sqls = []
+    for layout_col in FILTER_INDEX_LAYOUT_COLUMNS:
+        col = layout_name_map.get(layout_col)
+        if col and col in output_cols:
+            sqls.append(
+                f'CREATE INDEX IF NOT EXISTS "{table}_{layout_col}_lower_idx" '
+                f'ON "{table}" (lower("{col}"::text) text_pattern_ops);'
+            )
+    return sqls
+
+
+# Generation pro materialisierter Tabelle: jeder Rebuild erhöht sie in seiner Transaktion.
+# Werte kommen aus einer Sequenz -> werden nie wiederverwendet (auch nicht nach DROP/Neuanlage).
+# /api/tabledata liefert sie als ETag und beantwortet If-None-Match ohne Tabellenzugriff.
+_generations_ready = False
+_generations_lock = threading.Lock()
+
+
+def ensure_generations_table() -> None:
+    """Einmal pro Prozess, eigene (committete) Verbindung – Builder laufen parallel in Threads."""
+    global _generations_ready
+    if _generations_ready:
+        return
+    with _generations_lock:
+        if _generations_ready:
+            return
+        import psycopg2
+        from backend.settings.connection_points import DB_URL
+        conn = psycopg2.connect(DB_URL)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE SEQUENCE IF NOT EXISTS materialized_generation_seq;
+                    CREATE TABLE IF NOT EXISTS materialized_generations (
+                        table_name text PRIMARY KEY,
+                        generation bigint NOT NULL,
+                        updated_at timestamptz NOT NULL DEFAULT now()
+                    );
+                    CREATE TABLE IF NOT EXISTS materialized_row_hashes (
+                        table_name         text   NOT NULL,
+                        generation         bigint NOT NULL,
+                        row_key            text   NOT NULL,
+                        project_article_id int,
+                        order_key          numeric,
+                        row_hash           text   NOT NULL,
+                        PRIMARY KEY (table_name, generation, row_key)
+                    );
+                    CREATE TABLE IF NOT EXISTS materialized_delta_subscribers (
+                        table_name   text PRIMARY KEY,
+                        requested_at timestamptz NOT NULL DEFAULT now()
+                    );
+                """)
+            conn.commit()
+        finally:
+            conn.close()
+        _generations_ready = True
+
+
+def bump_generation(cursor, table_name: str) -> int:
+    """Neue Generation für table_name (DB-API-Cursor, läuft in dessen Transaktion)."""
+    ensure_generations_table()
+    cursor.execute("""
+        INSERT INTO materialized_generations (table_name, generation)
+        VALUES (%s, nextval('materialized_generation_seq'))
+        ON CONFLICT (table_name) DO UPDATE
+            SET generation = EXCLUDED.generation, updated_at = now()
+        RETURNING generation
+    """, (table_name,))
+    generation = cursor.fetchone()[0]
+    # wird erst beim Commit zugestellt -> Caches (utils/tabledata_cache.py) verwerfen die Tabelle
+    cursor.execute("SELECT pg_notify('materialized_changed', %s)", (table_name,))
+    return generation
+
+
+async def bump_generation_async(conn, table_name: str) -> int:
+    """bump_generation für asyncpg (läuft in der Transaktion der Connection, falls offen)."""
+    import asyncio
+    await asyncio.to_thread(ensure_generations_table)
+    generation = await conn.fetchval("""
+        INSERT INTO materialized_generations (table_name, generation)
+        VALUES ($1, nextval('materialized_generation_seq'))
+        ON CONFLICT (table_name) DO UPDATE
+            SET generation = EXCLUDED.generation, updated_at = now()
+        RETURNING generation
+    """, table_name)
+    await conn.execute("SELECT pg_notify('materialized_changed', $1)", table_name)
+    return generation
+
+
+# Quelldaten ohne eigene Tabelle: "articles" wird von jedem Schreiber (Import, Doku-Zähler) erhöht.
+# Abgeleitete Tabellen (Artikel-Viz) sind veraltet, solange ihre Generation kleiner ist.
+ARTICLES_GENERATION = "articles"
+
+
+# Zeilen-Snapshots für /api/tabledata/delta: pro Generation (row_key, Hash, order_key).
+# Nur für Tabellen, für die in den letzten DELTA_SUBSCRIBER_TTL_HOURS ein Delta angefragt wurde
+# (materialized_delta_subscribers) – alle anderen Rebuilds schreiben keine Snapshots.
+# row_key = Identität + "#" + laufende Nummer je Identität in Sheet-Reihenfolge; Identität ist
+# project_article_id, bei Zeilen ohne ID (Header, Tabellen ohne die Spalte) der Inhalts-Hash –
+# ein eingefügter Header nummeriert so keine anderen Zeilen um.
+# Der Hash ignoriert order_key, reine Umsortierungen sind so als "moved" erkennbar.
+DELTA_KEEP_GENERATIONS = 5
+DELTA_SUBSCRIBER_TTL_HOURS = 24
+
+
+def _row_hash_sql(alias: str) -> str:
+    return f"md5((to_jsonb({alias}) - 'order_key')::text)"
+
+
+def row_key_sql(alias: str, columns) -> str:
+    if "project_article_id" not in columns:
+        identity = f"'r:' || {_row_hash_sql(alias)}"
+    else:
+        identity = f"COALESCE({alias}.\"project_article_id\"::text, 'h:' || {_row_hash_sql(alias)})"
+    return (
+        f"{identity} || '#' || "
+        f"row_number() OVER (PARTITION BY {identity} ORDER BY {alias}.\"order_key\")"
+    )
+
+
+def snapshot_select_sql(table_name: str, columns) -> str:
+    """SELECT row_key, project_article_id, order_key, row_hash – für psycopg2 und asyncpg."""
+    pa_sql = 't."project_article_id"' if "project_article_id" in columns else "NULL::int"
+    return f"""
+        SELECT {row_key_sql("t", columns)}, {pa_sql}, t."order_key", {_row_hash_sql("t")}
+        FROM "{table_name}" t
+    """
+
+
+def snapshot_row_hashes(cursor, table_name: str, generation: int, columns,
+                        keep: int = DELTA_KEEP_GENERATIONS) -> None:
+    """
+    Snapshot der neuen Generation schreiben, ältere als die letzten `keep` verwerfen.
+    Ohne aktuellen Delta-Abonnenten: nichts schreiben, vorhandene Snapshots löschen.
+    """
+    cursor.execute("""
+        SELECT EXISTS (SELECT 1 FROM materialized_delta_subscribers
+                       WHERE table_name = %s AND requested_at > now() - make_interval(hours => %s))
+    """, (table_name, DELTA_SUBSCRIBER_TTL_HOURS))
+    if not cursor.fetchone()[0]:
+        cursor.execute("DELETE FROM materialized_row_hashes WHERE table_name = %s", (table_name,))
+        return
+    cursor.execute(f"""
+        INSERT INTO materialized_row_hashes
+            (table_name, generation, row_key, project_article_id, order_key, row_hash)
+        SELECT %s, %s, s.* FROM ({snapshot_select_sql(table_name, columns)}) s
+    """, (table_name, generation))
+    cursor.execute("""
+        DELETE FROM materialized_row_hashes
+        WHERE table_name = %s
+          AND generation < ALL (
+              SELECT generation FROM materialized_row_hashes
+              WHERE table_name = %s
+              GROUP BY generation
+              ORDER BY generation DESC
+              LIMIT %s
+          )
+    """, (table_name, table_name, keep))
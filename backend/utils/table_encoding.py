@@ -0,0 +1,153 @@
+# backend/utils/table_encoding.py
+"""
+Kompaktes Antwortformat für /api/tabledata (opt-in über den Accept-Header).
+
+Accept: application/x-msgpack  (auch application/msgpack, application/vnd.msgpack)
+liefert MessagePack statt JSON, spaltenweise direkt aus den asyncpg-Records:
+
+    {
+      "format": "columnar-v1",
+      "headers": [...],
+      "row_count": n,
+      "columns": [
+        {"name": "...", "type": "i64", "values": <bin: n x int64 little-endian>,   "nulls": <bin>|nil},
+        {"name": "...", "type": "f64", "values": <bin: n x float64 little-endian>, "nulls": <bin>|nil},
+        {"name": "...", "type": "dec", "values": <bin: n x int64 little-endian>,   "nulls": <bin>|nil,
+         "scale": s},
+        {"name": "...", "type": "str", "values": ["..", ..],                      "nulls": <bin>|nil},
+      ],
+      ... (weitere Felder der JSON-Antwort, z. B. total / first_cursor im Fenster-Modus)
+    }
+
+Spaltentyp nach den Nicht-NULL-Werten:
+- i64: nur Ganzzahlen, alle im int64-Bereich (sonst "str" mit den Ziffern als Text)
+- f64: nur float (bzw. float gemischt mit int)
+- dec: nur Decimal (numeric), exakt als Ganzzahl * 10^-scale; passt das nicht in int64
+  (oder NaN/Infinity) -> "str" mit str(Decimal)
+- str: alles andere, jeder Wert als String (bool -> "true"/"false", Datum -> ISO, JSON -> Text)
+nulls = Bitmap (Bit i = Zeile i ist NULL, LSB zuerst), nil wenn die Spalte keine NULLs hat.
+In Zahlen-Spalten steht an NULL-Positionen 0, in "str"-Spalten wie im JSON-Format "".
+Ohne passenden Accept-Header bleibt JSON das Format.
+"""
+
+import datetime
+import json
+import struct
+import uuid
+from decimal import Decimal
+from typing import Any, Dict, List, Sequence
+
+import msgpack
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+_MSGPACK_ACCEPT = ("application/x-msgpack", "application/msgpack", "application/vnd.msgpack")
+COLUMNAR_FORMAT = "columnar-v1"
+
+
+def wants_msgpack(accept: str | None) -> bool:
+    if not accept:
+        return False
+    for part in accept.split(","):
+        media, _, params = part.strip().partition(";")
+        if media.strip().lower() in _MSGPACK_ACCEPT and "q=0" not in params.replace(" ", "").split(";"):
+            return True
+    return False
+
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        return str(value)  # exakt, kein Umweg über float
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, datetime.timedelta)):
+        return str(value)
+    raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+def _kind(value: Any) -> str:
+    if isinstance(value, bool):
+        return "other"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "float"
+    if isinstance(value, Decimal):
+        return "decimal"
+    return "other"
+
+
+def _fits_int64(values: List[int]) -> bool:
+    return all(INT64_MIN <= v <= INT64_MAX for v in values)
+
+
+def _pack_i64(values: List[Any]) -> bytes:
+    return struct.pack(f"<{len(values)}q", *[0 if v is None else v for v in values])
+
+
+def _as_str(value: Any) -> str:
+    """Wert für eine "str"-Spalte: NULL -> "", bool/Datum/JSON wie im JSON-Format, sonst str()."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def _encode_column(name: str, values: List[Any]) -> Dict[str, Any]:
+    n = len(values)
+    bitmap = bytearray((n + 7) // 8)
+    has_null = False
+    kinds = set()
+    for i, v in enumerate(values):
+        if v is None:
+            bitmap[i >> 3] |= 1 << (i & 7)
+            has_null = True
+        else:
+            kinds.add(_kind(v))
+    nulls = bytes(bitmap) if has_null else None
+    present = [v for v in values if v is not None]
+
+    if kinds == {"int"}:
+        if _fits_int64(present):
+            return {"name": name, "type": "i64", "values": _pack_i64(values), "nulls": nulls}
+        return {"name": name, "type": "str", "values": ["" if v is None else str(v) for v in values], "nulls": nulls}
+    if kinds and kinds <= {"int", "float"}:
+        packed = struct.pack(f"<{n}d", *[0.0 if v is None else float(v) for v in values])
+        return {"name": name, "type": "f64", "values": packed, "nulls": nulls}
+    if kinds and kinds <= {"int", "decimal"}:
+        # numeric exakt übertragen: gemeinsame Skala = größte Nachkommastellenzahl der Spalte
+        decimals = [Decimal(v) for v in present]
+        if all(d.is_finite() for d in decimals):
+            scale = max(0, *(-d.as_tuple().exponent for d in decimals))
+            scaled = [int(d.scaleb(scale)) for d in decimals]
+            if _fits_int64(scaled):
+                it = iter(scaled)
+                packed = _pack_i64([None if v is None else next(it) for v in values])
+                return {"name": name, "type": "dec", "values": packed, "nulls": nulls, "scale": scale}
+        return {"name": name, "type": "str", "values": ["" if v is None else str(v) for v in values], "nulls": nulls}
+    return {"name": name, "type": "str", "values": [_as_str(v) for v in values], "nulls": nulls}
+
+
+def encode_columnar_msgpack(headers: Sequence[str], records: Sequence[Any], **extra) -> bytes:
+    """Records (asyncpg oder Listen in Header-Reihenfolge) -> MessagePack columnar-v1."""
+    columns = []
+    for idx, name in enumerate(headers):
+        values = [record[idx] for record in records]
+        columns.append(_encode_column(name, values))
+    payload = {
+        "format": COLUMNAR_FORMAT,
+        "headers": list(headers),
+        "row_count": len(records),
+        "columns": columns,
+        **extra,
+    }
+    return msgpack.packb(payload, default=_default, use_bin_type=True)
@@ -0,0 +1,175 @@
+# backend/utils/tabledata_cache.py
+"""
+In-process LRU cache of encoded /api/tabledata responses.
+- Key: (table, project_id, window, format); value: body bytes + media type + ETag.
+- Bounded by TABLEDATA_CACHE_MAX_BYTES (sum of body sizes), least recently used first out.
+- Invalidated per table via Postgres NOTIFY "materialized_changed" (sent by bump_generation
+  on commit of every rebuild), so all worker processes drop stale entries.
+- Only active while the listener connection is up; otherwise every request goes to the DB.
+- Misses are coalesced (tabledata_flight): identical concurrent requests share one fetch.
+"""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import asyncpg
+
+from backend.settings.connection_points import DB_URL, DEBUG, TABLEDATA_CACHE_MAX_BYTES
+from backend.utils.single_flight import SingleFlight
+
+NOTIFY_CHANNEL = "materialized_changed"
+
+
+class CachedPayload(NamedTuple):
+    body: bytes
+    media_type: str
+    etag: Optional[str]
+    generation: Optional[int] = None
+
+
+class PayloadCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.enabled = False
+        self._entries: "OrderedDict[Tuple, CachedPayload]" = OrderedDict()
+        self._by_table: Dict[str, set] = {}
+        self._epochs: Dict[str, int] = {}
+        self._resets = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def epoch(self, table: str) -> Tuple[int, int]:
+        """Vor dem DB-Read merken und an put() geben: verhindert, dass eine zwischenzeitliche
+        Invalidierung durch einen veralteten Eintrag überschrieben wird."""
+        return self._resets, self._epochs.get(table, 0)
+
+    def get(self, key: Tuple) -> Optional[CachedPayload]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Tuple, payload: CachedPayload, epoch: Tuple[int, int]) -> None:
+        table = key[0]
+        size = len(payload.body)
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            if (self._resets, self._epochs.get(table, 0)) != epoch:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.body)
+            self._entries[key] = payload
+            self._by_table.setdefault(table, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, old = self._entries.popitem(last=False)
+                self._forget(old_key)
+                self._bytes -= len(old.body)
+                self.evictions += 1
+
+    def _forget(self, key: Tuple) -> None:
+        keys = self._by_table.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_table[key[0]]
+
+    def invalidate_table(self, table: str) -> None:
+        with self._lock:
+            self._epochs[table] = self._epochs.get(table, 0) + 1
+            for key in self._by_table.pop(table, ()):
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= len(entry.body)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._resets += 1
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class GenerationListener:
+    """LISTEN materialized_changed auf einer eigenen Verbindung; reconnect mit Cache-Reset."""
+
+    def __init__(self, cache: PayloadCache, retry_delay: float = 5.0):
+        self.cache = cache
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.cache.max_bytes <= 0 or (self._task and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.cache.enabled = False
+
+    def _on_notify(self, _conn, _pid, _channel, table_name: str) -> None:
+        self.cache.invalidate_table(table_name)
+
+    async def _run(self) -> None:
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(DB_URL)
+                lost = asyncio.Event()
+                conn.add_termination_listener(lambda _c: lost.set())
+                await conn.add_listener(NOTIFY_CHANNEL, self._on_notify)
+                # Während der Verbindungslücke evtl. verpasste Invalidierungen -> alles verwerfen
+                self.cache.clear()
+                self.cache.enabled = True
+                if DEBUG:
+                    print(f"[DEBUG] tabledata cache active (LISTEN {NOTIFY_CHANNEL})")
+                await lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ tabledata cache listener: {e}")
+            finally:
+                self.cache.enabled = False
+                self.cache.clear()
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(self.retry_delay)
+
+
+tabledata_cache = PayloadCache(TABLEDATA_CACHE_MAX_BYTES)
+generation_listener = GenerationListener(tabledata_cache)
+# Coalescing der Cache-Misses: ein DB-Fetch + eine Kodierung pro (Key, Generation)
+tabledata_flight = SingleFlight()
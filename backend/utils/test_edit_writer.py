@@ -0,0 +1,176 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+import asyncio
+from types import SimpleNamespace
+
+import asyncpg
+import pytest
+
+from backend.utils.edit_writer import (
+    EDIT_CAST_ERROR_FUNCTION_SQL,
+    InvalidEdits,
+    cast_checks,
+    group_edits,
+    validate_edits,
+)
+from backend.settings.connection_points import DB_URL
+
+SNAPSHOT = SimpleNamespace(
+    ext_to_int={"Menge": "qty", "Position": "position", "Text": "text_de"},
+    ext_to_table={"Menge": "project_articles", "Position": "project_articles",
+                  "Text": "articles", "Einbauort": None},
+    column_types={
+        "project_articles": {"qty": "real", "position": "integer"},
+        "article_drafts": {"text_de": "character varying(5)"},
+    },
+)
+
+
+def _edit(col, value, row_id=1):
+    return {"rowId": row_id, "colName": col, "newValue": value}
+
+
+# --- group_edits / InvalidEdits -----------------------------------------------
+
+def test_group_edits_splits_tables_and_maps_columns():
+    pa, ad = group_edits(
+        [_edit("Menge", "2.5"), _edit("Position", "7"), _edit("Text", "abc", row_id=2), _edit("Einbauort", "x")],
+        SNAPSHOT.ext_to_int, SNAPSHOT.ext_to_table,
+    )
+    assert pa == {1: {"qty": "2.5", "position": 7}}
+    assert ad == {2: {"text_de": "abc"}}
+
+
+def test_group_edits_int_fields_empty_is_null():
+    pa, _ = group_edits([_edit("Position", "")], SNAPSHOT.ext_to_int, SNAPSHOT.ext_to_table)
+    assert pa == {1: {"position": None}}
+
+
+def test_group_edits_rejects_non_numeric_int_field():
+    with pytest.raises(ValueError):
+        group_edits([_edit("Position", "abc")], SNAPSHOT.ext_to_int, SNAPSHOT.ext_to_table)
+
+
+def test_invalid_edits_is_value_error_with_cells():
+    cells = [{"rowId": 1, "colName": "Menge", "error": "boom"}]
+    e = InvalidEdits(cells)
+    assert isinstance(e, ValueError)
+    assert e.cells == cells
+    assert "1 invalid" in str(e)
+
+
+# --- cast_checks: genau der Text, den apply_grouped_edits schreibt -------------------
+
+def test_cast_checks_passes_text_unchanged():
+    checks, invalid = cast_checks([_edit("Menge", "-Infinity"), _edit("Text", "NaN")], SNAPSHOT)
+    assert invalid == []
+    assert [(t, v) for _, t, v in checks] == [("real", "-Infinity"), ("character varying(5)", "NaN")]
+
+
+def test_cast_checks_int_fields_like_group_edits():
+    # group_edits schreibt int("4_2") == 42 -> geprüft wird "42"
+    checks, invalid = cast_checks([_edit("Position", "4_2"), _edit("Position", "", row_id=2)], SNAPSHOT)
+    assert invalid == []
+    assert [(t, v) for _, t, v in checks] == [("integer", "42")]
+
+
+def test_cast_checks_int_field_not_a_number():
+    checks, invalid = cast_checks([_edit("Position", "abc")], SNAPSHOT)
+    assert checks == []
+    assert invalid[0]["rowId"] == 1 and invalid[0]["colName"] == "Position"
+
+
+def test_cast_checks_skips_null_and_unmapped_columns():
+    checks, invalid = cast_checks([_edit("Menge", None), _edit("Einbauort", "x")], SNAPSHOT)
+    assert checks == [] and invalid == []
+
+
+# --- validate_edits: eine Rundreise, Fehler von Postgres ------------------------------
+
+class _FakeConn:
+    def __init__(self, errors):
+        self.errors = errors
+        self.calls = []
+
+    async def fetch(self, sql, types, values):
+        self.calls.append((types, values))
+        return [{"typ": t, "val": v, "error": self.errors.get(v)} for t, v in zip(types, values)]
+
+
+def test_validate_edits_one_query_for_distinct_pairs():
+    conn = _FakeConn({"zu lang": "value too long for type character varying(5)"})
+    edits = [_edit("Text", "zu lang", row_id=i) for i in range(3)] + [_edit("Menge", "1"), _edit("Text", "ok")]
+    invalid = asyncio.run(validate_edits(conn, edits, SNAPSHOT))
+    assert len(conn.calls) == 1
+    types, values = conn.calls[0]
+    assert sorted(zip(types, values)) == [("character varying(5)", "ok"), ("character varying(5)", "zu lang"),
+                                          ("real", "1")]
+    assert [c["rowId"] for c in invalid] == [0, 1, 2]
+
+
+def test_validate_edits_without_casts_skips_db():
+    conn = _FakeConn({})
+    assert asyncio.run(validate_edits(conn, [_edit("Menge", None), _edit("Einbauort", "x")], SNAPSHOT)) == []
+    assert conn.calls == []
+
+
+# --- edit_cast_error gegen eine echte Datenbank (übersprungen ohne DB) -----------------
+
+CAST_CASES = [
+    ("real", "NaN", False),
+    ("real", "Infinity", False),
+    ("real", "-Infinity", False),
+    ("real", "1e39", True),
+    ("double precision", "-Infinity", False),
+    ("numeric", "NaN", False),
+    ("numeric(5,2)", "999.994", False),
+    ("numeric(5,2)", "999.995", True),
+    ("integer", "2147483648", True),
+    ("integer", "abc", True),
+    ("boolean", "yes", False),
+    ("boolean", "nein", True),
+    ("character varying(5)", "abcde", False),
+    ("character varying(5)", "abcdef", True),
+    ("character varying(5)", "abcde   ", False),
+    ("character(3)", "abcd", True),
+    ("date", "2024-02-30", True),
+]
+
+
+async def _with_cast_function(run):
+    """run(conn) mit edit_cast_error als pg_temp-Funktion (nichts bleibt in der DB)."""
+    try:
+        conn = await asyncpg.connect(DB_URL, timeout=3)
+    except (OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+        pytest.skip(f"no database: {e}")
+    try:
+        async with conn.transaction():
+            await conn.execute(EDIT_CAST_ERROR_FUNCTION_SQL.replace(
+                "FUNCTION edit_cast_error", "FUNCTION pg_temp.edit_cast_error"))
+            return await run(conn)
+    finally:
+        await conn.close()
+
+
+def test_edit_cast_error_edge_cases():
+    async def run(conn):
+        return await conn.fetch("""
+            SELECT pg_temp.edit_cast_error(v.val, v.typ) AS error
+            FROM unnest($1::text[], $2::text[]) WITH ORDINALITY AS v(typ, val, n) ORDER BY n
+        """, [t for t, _, _ in CAST_CASES], [v for _, v, _ in CAST_CASES])
+    rows = asyncio.run(_with_cast_function(run))
+    for (typ, val, should_fail), row in zip(CAST_CASES, rows):
+        assert (row["error"] is not None) == should_fail, (typ, val, row["error"])
+
+
+def test_edit_cast_error_underscores_match_server_version():
+    # Postgres >= 16 akzeptiert "4_2" als integer, ältere nicht – maßgeblich ist der Server, nicht Python
+    async def run(conn):
+        return (
+            await conn.fetchval("SELECT pg_temp.edit_cast_error('4_2', 'integer')"),
+            await conn.fetchval("SELECT current_setting('server_version_num')::int"),
+        )
+    error, version = asyncio.run(_with_cast_function(run))
+    assert (error is None) == (version >= 160000)